@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Play levels headless across a grid of balance parameters, in parallel worker processes.
+
+Every combination of enemy speed, rainbow cooldown, jump power and level is played
+--runs times by an input policy (a random one, or a simple bot that chases enemies and
+fruit). Each run gets --frames frames to clear its level, restarting after every death.
+The results are aggregated per combination into completion rate, time to clear, deaths
+and score, along with the simulation throughput in frames per second.
+"""
+
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import time
+
+import pygame
+
+# Workers never open a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from rainbow_islands_game import Game, GameState, Input, FPS
+
+# Actions the random policy picks from, each held for a short while
+RANDOM_ACTIONS = [Input.NONE, Input.LEFT, Input.RIGHT, Input.JUMP, Input.LEFT | Input.JUMP,
+                  Input.RIGHT | Input.JUMP, Input.LEFT | Input.SHOOT, Input.RIGHT | Input.SHOOT]
+
+
+class RandomPolicy:
+    """Mash random actions, holding each for 10-40 frames"""
+    def __init__(self, rng):
+        self.rng = rng
+        self.action = Input.NONE
+        self.frames_left = 0
+
+    def __call__(self, game):
+        if self.frames_left <= 0:
+            self.action = self.rng.choice(RANDOM_ACTIONS)
+            self.frames_left = self.rng.randint(10, 40)
+        self.frames_left -= 1
+        return self.action
+
+
+def ground_at(game, x, y):
+    """Whether a platform is right under a player-wide strip at (x, y)"""
+    probe = pygame.Rect(x, y, game.player.width, 4)
+    return any(probe.colliderect((platform.x, platform.y, platform.width, platform.height))
+               for platform in game.platform_grid.query(probe))
+
+
+class ChasePolicy:
+    """Walk towards the nearest enemy or fruit, shooting enemies ahead, jumping gaps and hopping now and then"""
+    def __init__(self, rng):
+        self.rng = rng
+        self.move = Input.NONE  # Direction kept while in the air, so jumps are seen through
+
+    def __call__(self, game):
+        player = game.player
+        if not player.on_ground:
+            return self.move
+        targets = [(enemy.x, enemy.y, True) for enemy in game.enemies]
+        targets += [(fruit.x, fruit.y, False) for fruit in game.fruits]
+        if not targets:
+            return Input.NONE
+        # Prefer targets on the player's own level; climbing is slow
+        target_x, target_y, is_enemy = min(targets, key=lambda target: abs(target[0] - player.x) +
+                                           4 * abs(target[1] - player.y))
+        dx = target_x - player.x
+        dy = target_y - player.y
+
+        inputs = Input.NONE
+        toward = Input.RIGHT if dx > 0 else Input.LEFT
+        away = Input.LEFT if dx > 0 else Input.RIGHT
+        level_with_target = abs(dy) < 32
+        if is_enemy and level_with_target and abs(dx) < 90:
+            # Rainbows land just ahead of the player: keep a shooting distance and fire
+            if abs(dx) < 40:
+                inputs |= away
+            elif (dx > 0) != player.facing_right:
+                inputs |= toward  # Turn around
+            else:
+                inputs |= Input.SHOOT
+        elif abs(dx) > 4:
+            inputs |= toward
+
+        # Leap over gaps instead of walking off ledges (unless the target is below)
+        if inputs & (Input.LEFT | Input.RIGHT) and dy < 40:
+            step = player.speed if inputs & Input.RIGHT else -player.speed
+            if not ground_at(game, player.x + step * 4, player.y + player.height):
+                inputs |= Input.JUMP
+        if ((dy < -40 and self.rng.random() < 0.1) or self.rng.random() < 0.02):
+            inputs |= Input.JUMP
+        self.move = inputs & (Input.LEFT | Input.RIGHT)
+        return inputs
+
+
+POLICIES = {"random": RandomPolicy, "chase": ChasePolicy}
+
+
+def start_level(game, config):
+    """(Re)start the configured level and apply the configuration's balance parameters"""
+    enemy_speed, shot_cooldown, jump_power, level = config
+    game.reset(level)
+    game.player.shot_cooldown = shot_cooldown
+    game.player.jump_power = jump_power
+    for enemy in game.enemies:
+        enemy.speed = enemy_speed
+
+
+def run_task(task):
+    """Play one run; returns (config, cleared, frames to clear or None, deaths, score, frames simulated)"""
+    config, seed, frame_budget, policy_name = task
+    game = Game(headless=True, seed=seed, rewind_seconds=0)  # Bots never rewind
+    policy = POLICIES[policy_name](random.Random(seed))
+    start_level(game, config)
+
+    deaths = 0
+    score = 0  # Points from earlier attempts; restarting resets game.score
+    for frame in range(1, frame_budget + 1):
+        state = game.step(policy(game))
+        if state == GameState.LEVEL_COMPLETE:
+            return config, True, frame, deaths, score + game.score, frame
+        if state == GameState.GAME_OVER:
+            deaths += 1
+            score += game.score
+            start_level(game, config)
+    return config, False, None, deaths, score + game.score, frame_budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep level balance parameters with headless games")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: one per CPU core)")
+    parser.add_argument("--runs", type=int, default=8, help="runs per parameter combination (default: 8)")
+    parser.add_argument("--frames", type=int, default=FPS * 120,
+                        help=f"frame budget per run (default: {FPS * 120}, two minutes of play)")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="chase", help="input policy (default: chase)")
+    parser.add_argument("--enemy-speed", type=float, nargs="+", default=[1.0], help="enemy speeds (default: 1)")
+    parser.add_argument("--cooldown", type=int, nargs="+", default=[30],
+                        help="frames between rainbow shots (default: 30)")
+    parser.add_argument("--jump-power", type=float, nargs="+", default=[-8.0],
+                        help="jump velocities, negative is up (default: -8)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2], help="levels to play (default: 1 2)")
+    parser.add_argument("--seed", type=int, default=0, help="first run seed (default: 0)")
+    parser.add_argument("--csv", metavar="PATH", help="write the aggregated results to a CSV file")
+    args = parser.parse_args()
+
+    configs = list(itertools.product(args.enemy_speed, args.cooldown, args.jump_power, args.levels))
+    tasks = [(config, args.seed + run, args.frames, args.policy) for config in configs for run in range(args.runs)]
+
+    start = time.perf_counter()
+    results = {config: [] for config in configs}
+    with multiprocessing.Pool(args.workers) as pool:
+        # Runs are independent, so throughput scales with the number of cores
+        for result in pool.imap_unordered(run_task, tasks):
+            results[result[0]].append(result[1:])
+        # Let the workers exit on their own: pygame's SDL swallows the SIGTERM terminate() sends
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - start
+
+    rows = []
+    for config in configs:
+        runs = results[config]
+        clear_frames = [frames_to_clear for cleared, frames_to_clear, *_ in runs if cleared]
+        rows.append(list(config) + [
+            len(clear_frames) / len(runs),
+            sum(clear_frames) / len(clear_frames) / FPS if clear_frames else None,
+            sum(run[2] for run in runs) / len(runs),
+            sum(run[3] for run in runs) / len(runs),
+        ])
+
+    header = ["enemy_speed", "cooldown", "jump_power", "level", "completion", "clear_s", "deaths", "score"]
+    print(f"{header[0]:>11}{header[1]:>9}{header[2]:>11}{header[3]:>6}{header[4]:>11}{header[5]:>9}"
+          f"{header[6]:>8}{header[7]:>8}")
+    for enemy_speed, cooldown, jump_power, level, completion, clear_s, deaths, score in rows:
+        clear_text = f"{clear_s:.1f}" if clear_s is not None else "-"
+        print(f"{enemy_speed:>11g}{cooldown:>9}{jump_power:>11g}{level:>6}{completion:>11.0%}{clear_text:>9}"
+              f"{deaths:>8.1f}{score:>8.0f}")
+
+    total_frames = sum(run[4] for runs in results.values() for run in runs)
+    print(f"\n{len(tasks)} runs, {total_frames} frames in {elapsed:.2f}s on {args.workers} workers: "
+          f"{total_frames / elapsed:.0f} simulated frames/s ({total_frames / elapsed / args.workers:.0f} per worker)")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Measure the memory and attribute-access cost of the game's entity classes.
+
+Each slotted entity class is compared against a clone that keeps a per-instance
+__dict__ (how the classes were stored before), so the saving can be tracked over time.
+Pass --csv PATH to append the results to a CSV file.
+"""
+
+import argparse
+import csv
+import os
+import time
+import timeit
+import tracemalloc
+
+# Entities never need a window; this also lets the benchmark run on machines without a display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from rainbow_islands_game import Player, Platform, Enemy, Rainbow, DeadEnemy, Fruit, WinnersCup
+
+# Entity class -> constructor arguments
+ENTITIES = [
+    (Player, (100, 500)),
+    (Platform, (0, 580, 800, 20)),
+    (Enemy, (300, 400, 250, 450)),
+    (Rainbow, (150, 480, 1)),
+    (DeadEnemy, (300, 400)),
+    (Fruit, (304, 404)),
+    (WinnersCup, (400, 100)),
+]
+
+
+def unslotted(cls):
+    """Return a copy of cls whose instances store their attributes in a __dict__"""
+    namespace = {name: value for name, value in vars(cls).items()
+                 if name not in cls.__slots__ and name not in ("__slots__", "__dict__", "__weakref__")}
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+def bytes_per_entity(cls, args, count):
+    """Average memory allocated per instance while creating count instances"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entities = [cls(*args) for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    list_bytes = 8 * len(entities)  # The list's own pointer to each entity isn't part of it
+    return (after - before - list_bytes) / count
+
+
+def access_ns(cls, args, number):
+    """Nanoseconds per attribute read or write, using the pattern of a physics update"""
+    timer = timeit.Timer("e.x = e.x + 1; e.y = e.y + e.width * 0", globals={"e": cls(*args)})
+    seconds = min(timer.repeat(number=number, repeat=5))
+    return seconds / number / 5 * 1e9  # Each loop makes 5 attribute accesses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark entity memory use and attribute access")
+    parser.add_argument("--count", type=int, default=10000, help="instances created per class (default: 10000)")
+    parser.add_argument("--number", type=int, default=200000, help="timed access loops per class (default: 200000)")
+    parser.add_argument("--csv", metavar="PATH", help="append the results to a CSV file")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'entity':<12}{'dict B':>9}{'slots B':>9}{'saved':>8}{'dict ns':>10}{'slots ns':>10}")
+    for cls, ctor_args in ENTITIES:
+        dict_cls = unslotted(cls)
+        dict_bytes = bytes_per_entity(dict_cls, ctor_args, args.count)
+        slot_bytes = bytes_per_entity(cls, ctor_args, args.count)
+        dict_ns = access_ns(dict_cls, ctor_args, args.number)
+        slot_ns = access_ns(cls, ctor_args, args.number)
+        saved = 1 - slot_bytes / dict_bytes
+        print(f"{cls.__name__:<12}{dict_bytes:>9.0f}{slot_bytes:>9.0f}{saved:>8.0%}{dict_ns:>10.1f}{slot_ns:>10.1f}")
+        rows.append([time.strftime("%Y-%m-%d %H:%M:%S"), cls.__name__, round(dict_bytes), round(slot_bytes),
+                     round(dict_ns, 2), round(slot_ns, 2)])
+
+    if args.csv:
+        write_header = not os.path.exists(args.csv)
+        with open(args.csv, "a", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            if write_header:
+                writer.writerow(["time", "entity", "dict_bytes", "slots_bytes", "dict_ns", "slots_ns"])
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Time Game.update and Game.draw over scripted stress scenarios.
+
+Each scenario sets up a level, then plays a fixed number of frames with scripted inputs,
+timing the simulation step and the draw of every frame separately. The mean and p95
+milliseconds per frame are compared against a baseline file: any mean more than --threshold
+slower than its baseline is reported as a regression (exit status 1). --save-baseline
+records the current results as the new baseline. Timings depend on the machine, so keep
+baselines from the same one.
+
+Runs under SDL's dummy video driver, so no display is needed.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from array import array
+
+# Drawing goes to an off-screen dummy display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from level_loader import LevelData
+from rainbow_islands_game import Game, GameState, Input, FRUIT_COLORS
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+def shoot_now_and_then(frame):
+    """Stand still and shoot every 40 frames"""
+    return Input.SHOOT if frame % 40 == 0 else Input.NONE
+
+
+def idle(frame):
+    return Input.NONE
+
+
+def stock_level(number):
+    def setup(game):
+        game.reset(number)
+        return shoot_now_and_then
+    return setup
+
+
+def patrolling_enemies(count):
+    def setup(game):
+        game.reset(1)
+        # Patrols across the upper screen, clear of the player standing on the floor
+        rng = random.Random(count)
+        patrols = array("d")
+        for _ in range(count):
+            start = rng.uniform(0, 680)
+            patrols.extend((start + rng.uniform(0, 76), rng.uniform(40, 440), start, start + 100))
+        level = game.level_data
+        game.level_data = LevelData(f"{count} enemies", level.height, level.player_start, level.platforms,
+                                    patrols, level.trophy)
+        game.enemies = game.create_enemies()
+        return idle
+    return setup
+
+
+def add_bridge(game, x, y):
+    """Add a rainbow that has already finished its arc and become a solid bridge"""
+    rainbow = game.rainbow_pool.acquire(x, y, 1)
+    while not rainbow.solid:
+        rainbow.update()
+    game.rainbows.append(rainbow)
+    return rainbow
+
+
+def solid_bridges(game):
+    game.reset(1)
+    # Far enough apart that none of them touch
+    for row in range(10):
+        for column in range(5):
+            add_bridge(game, 60 + column * 160, 60 + row * 45)
+    return idle
+
+
+def chain_collapse(game):
+    game.reset(1)
+    # Five rows of overlapping bridges, each row 40 pixels above the next: once the first bridge
+    # falls, its row collapses at once and each falling row brings down the one below
+    bridges = [add_bridge(game, 50 + column * 70, 120 + row * 40) for row in range(5) for column in range(10)]
+    bridges[0].dissolve()
+    return idle
+
+
+def bobbing_fruit(game):
+    game.reset(1)
+    for row in range(10):
+        for column in range(20):
+            fruit = game.fruit_pool.acquire(20 + column * 38, 60 + row * 38, game.rng.choice(FRUIT_COLORS))
+            game.fruits.append(fruit)
+            game.fruit_grid.insert(fruit, (fruit.x, fruit.y, fruit.width, fruit.height))
+    return idle
+
+
+SCENARIOS = {
+    "level_1": stock_level(1),
+    "level_2": stock_level(2),
+    "enemies_100": patrolling_enemies(100),
+    "enemies_1000": patrolling_enemies(1000),
+    "enemies_10000": patrolling_enemies(10000),
+    "bridges_50": solid_bridges,
+    "chain_collapse": chain_collapse,
+    "fruit_200": bobbing_fruit,
+}
+
+
+def summarize(samples):
+    """Mean and p95 of a list of milliseconds"""
+    ordered = sorted(samples)
+    return sum(ordered) / len(ordered), ordered[int(0.95 * (len(ordered) - 1))]
+
+
+def run_scenario(setup, frames, array_enemies, dirty_rects):
+    """Play one scenario; returns (update mean, update p95, draw mean, draw p95, state at the end)"""
+    # Without the rewind buffer's per-frame snapshot, so update times are Game.update's alone
+    game = Game(dirty_rects=dirty_rects, array_enemies=array_enemies, seed=0, rewind_seconds=0)
+    game.verbose = False
+    script = setup(game)
+    game.draw()  # Bake the background and fill the text caches outside the timings
+
+    update_ms = []
+    draw_ms = []
+    for frame in range(frames):
+        game.save_positions()
+        start = time.perf_counter()
+        game.step(script(frame))
+        middle = time.perf_counter()
+        game.draw()
+        end = time.perf_counter()
+        update_ms.append((middle - start) * 1000)
+        draw_ms.append((end - middle) * 1000)
+    return (*summarize(update_ms), *summarize(draw_ms), game.state)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Game.update and Game.draw over stress scenarios")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--frames", type=int, default=240, help="frames per scenario (default: 240)")
+    parser.add_argument("--array-enemies", action="store_true", help="keep enemies in NumPy arrays")
+    parser.add_argument("--dirty-rects", action="store_true", help="draw with dirty-rect rendering")
+    parser.add_argument("--baseline", metavar="PATH", default=BASELINE_PATH,
+                        help="baseline file to compare against (default: benchmark_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="record these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown of a mean over its baseline reported as a regression (default: 0.2, 20%%)")
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+
+    # Each rendering and enemy storage mode keeps baselines of its own
+    suffix = ("+array" if args.array_enemies else "") + ("+dirty" if args.dirty_rects else "")
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    regressions = []
+    results = {}
+    print(f"{'scenario':<22}{'update ms':>11}{'p95':>8}{'draw ms':>10}{'p95':>8}  vs baseline")
+    for name in args.scenarios or SCENARIOS:
+        key = name + suffix
+        update_mean, update_p95, draw_mean, draw_p95, state = run_scenario(
+            SCENARIOS[name], args.frames, args.array_enemies, args.dirty_rects)
+        results[key] = {"update_mean_ms": round(update_mean, 4), "update_p95_ms": round(update_p95, 4),
+                        "draw_mean_ms": round(draw_mean, 4), "draw_p95_ms": round(draw_p95, 4)}
+
+        comparison = "-"
+        if key in baseline:
+            changes = []
+            for metric, mean in (("update", update_mean), ("draw", draw_mean)):
+                previous = baseline[key][f"{metric}_mean_ms"]
+                change = mean / previous - 1 if previous else 0.0
+                changes.append(f"{metric} {change:+.0%}")
+                if change > args.threshold:
+                    regressions.append(f"{key} {metric}: {previous:.3f} -> {mean:.3f} ms ({change:+.0%})")
+            comparison = ", ".join(changes)
+        if state != GameState.PLAYING:
+            comparison += f" (ended in {state.name})"
+        print(f"{key:<22}{update_mean:>11.3f}{update_p95:>8.3f}{draw_mean:>10.3f}{draw_p95:>8.3f}  {comparison}")
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print(f"\nSaved the baseline to {args.baseline}")
+    elif regressions:
+        print(f"\nRegressions beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
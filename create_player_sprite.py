@@ -1,58 +1,246 @@
 #!/usr/bin/env python3
 """
-Simple script to create an example player sprite image.
-You can replace this with your own custom artwork.
+Simple script to create an example player sprite image, and to bake the game's other sprites.
+You can replace player.png with your own custom artwork.
+
+Besides player.png, it renders every sprite the game would otherwise draw shape by shape
+(the enemies' animation frames, dying enemies, fruit, the trophy and the platform bricks)
+into one packed image, atlas.png, with an index of where each sprite is in atlas.json. The
+game loads the atlas once at startup and draws everything by copying from it. If the atlas
+is missing or out of date, the game renders the same sprites at startup instead.
 """
 
-import pygame
-import sys
+import json
+import math
+import os
 
-# Initialize Pygame
-pygame.init()
+import pygame
 
-# Create a 32x32 surface for the player sprite
-sprite_size = (32, 32)
-sprite_surface = pygame.Surface(sprite_size, pygame.SRCALPHA)
+ATLAS_VERSION = 1  # Bump when a sprite changes, so old atlases are rebuilt
+ATLAS_WIDTH = 256
+ATLAS_PADDING = 1  # Transparent pixels between sprites
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+ATLAS_IMAGE = os.path.join(ASSET_DIR, "atlas.png")
+ATLAS_INDEX = os.path.join(ASSET_DIR, "atlas.json")
 
 # Colors
 ORANGE = (255, 165, 0)
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
+BLUE = (0, 100, 255)  # The enemies' blue
 DARK_ORANGE = (200, 120, 0)
 LIGHT_ORANGE = (255, 200, 100)
 
-# Draw a simple character sprite
-# Body (rounded rectangle)
-pygame.draw.rect(sprite_surface, ORANGE, (4, 8, 24, 24), border_radius=4)
+ENEMY_SIZE = 24
+BRICK_WIDTH = 32
+BRICK_HEIGHT = 16
+
+
+def draw_player():
+    """Draw the 32x32 player sprite"""
+    sprite_surface = pygame.Surface((32, 32), pygame.SRCALPHA)
+
+    # Body (rounded rectangle)
+    pygame.draw.rect(sprite_surface, ORANGE, (4, 8, 24, 24), border_radius=4)
+
+    # Head (circle)
+    pygame.draw.circle(sprite_surface, LIGHT_ORANGE, (16, 8), 8)
+
+    # Eyes
+    pygame.draw.circle(sprite_surface, WHITE, (13, 6), 2)
+    pygame.draw.circle(sprite_surface, WHITE, (19, 6), 2)
+    pygame.draw.circle(sprite_surface, BLACK, (14, 6), 1)
+    pygame.draw.circle(sprite_surface, BLACK, (20, 6), 1)
+
+    # Mouth (small smile)
+    pygame.draw.arc(sprite_surface, BLACK, (14, 8, 4, 3), 0, 3.14, 1)
+
+    # Arms
+    pygame.draw.circle(sprite_surface, ORANGE, (8, 16), 3)
+    pygame.draw.circle(sprite_surface, ORANGE, (24, 16), 3)
+
+    # Legs
+    pygame.draw.rect(sprite_surface, DARK_ORANGE, (12, 28, 3, 4))
+    pygame.draw.rect(sprite_surface, DARK_ORANGE, (17, 28, 3, 4))
+
+    # Add some shading/highlights
+    pygame.draw.circle(sprite_surface, LIGHT_ORANGE, (13, 5), 1)  # Eye highlight
+    pygame.draw.circle(sprite_surface, LIGHT_ORANGE, (19, 5), 1)  # Eye highlight
+    return sprite_surface
+
+
+def draw_enemy(direction, frame):
+    """Draw a patrolling enemy facing left (-1) or right (1) at one of its four mouth frames"""
+    surface = pygame.Surface((ENEMY_SIZE, ENEMY_SIZE), pygame.SRCALPHA)
+
+    # Main body with rounded corners (the face is drawn inside it)
+    pygame.draw.rect(surface, BLUE, (0, 0, ENEMY_SIZE, ENEMY_SIZE), border_radius=6)
+
+    # Eyes that look in the direction of movement
+    pygame.draw.circle(surface, WHITE, (6, 8), 3)
+    pygame.draw.circle(surface, WHITE, (18, 8), 3)
+
+    # Pupils follow movement direction
+    if direction > 0:  # Moving right
+        pygame.draw.circle(surface, BLACK, (7, 8), 1)  # Right pupil
+        pygame.draw.circle(surface, BLACK, (19, 8), 1)  # Right pupil
+    else:  # Moving left
+        pygame.draw.circle(surface, BLACK, (5, 8), 1)  # Left pupil
+        pygame.draw.circle(surface, BLACK, (17, 8), 1)  # Left pupil
+
+    # Animated mouth expressions based on current frame
+    if frame == 0:
+        # Frame 0: Small curved mouth
+        pygame.draw.arc(surface, BLACK, (8, 14, 8, 6), 0, math.pi, 2)
+    elif frame == 1:
+        # Frame 1: Slightly open mouth
+        pygame.draw.ellipse(surface, BLACK, (10, 15, 4, 3))
+    elif frame == 2:
+        # Frame 2: Open mouth
+        pygame.draw.ellipse(surface, BLACK, (9, 14, 6, 4))
+    else:  # Frame 3
+        # Frame 3: Closed mouth (line)
+        pygame.draw.line(surface, BLACK, (10, 16), (14, 16), 2)
+    return surface
+
+
+def draw_dead_enemy():
+    """Draw the defeated enemy that spins away (the game rotates it)"""
+    surface = pygame.Surface((ENEMY_SIZE, ENEMY_SIZE), pygame.SRCALPHA)
+    pygame.draw.rect(surface, BLUE, (0, 0, ENEMY_SIZE, ENEMY_SIZE))
+    # Draw simple face
+    pygame.draw.circle(surface, WHITE, (8, 8), 3)
+    pygame.draw.circle(surface, WHITE, (16, 8), 3)
+    pygame.draw.circle(surface, BLACK, (8, 8), 1)
+    pygame.draw.circle(surface, BLACK, (16, 8), 1)
+    return surface
+
+
+def draw_fruit(color):
+    """Draw a fruit; it sits 2 pixels up and left of the fruit's position"""
+    surface = pygame.Surface((20, 20), pygame.SRCALPHA)
+    # Fruit as a circle with a small white highlight
+    pygame.draw.circle(surface, color, (10, 10), 8)
+    pygame.draw.circle(surface, WHITE, (8, 8), 2)
+    return surface
+
+
+def draw_trophy():
+    """Draw the winner's cup without its sparkles; it sits 4 pixels left of the cup's position"""
+    surface = pygame.Surface((32, 32), pygame.SRCALPHA)
+    x = 4  # The handles stick out past the cup's left edge
+
+    # Cup base (dark gold)
+    pygame.draw.rect(surface, (184, 134, 11), (x + 6, 24, 12, 8))
+
+    # Cup stem (gold)
+    pygame.draw.rect(surface, (255, 215, 0), (x + 9, 18, 6, 6))
+
+    # Cup bowl (bright gold)
+    pygame.draw.ellipse(surface, (255, 215, 0), (x + 2, 8, 20, 12))
+
+    # Cup handles (gold)
+    pygame.draw.arc(surface, (255, 215, 0), (x - 2, 10, 8, 8), 0, math.pi, 3)
+    pygame.draw.arc(surface, (255, 215, 0), (x + 18, 10, 8, 8), 0, math.pi, 3)
+
+    # Cup top rim (bright gold)
+    pygame.draw.ellipse(surface, (255, 223, 0), (x + 4, 6, 16, 6))
+    return surface
+
+
+def draw_brick(surface, x, y, width, height):
+    """Draw one platform brick; bricks cut short at a platform's edge are drawn at their cut size"""
+    # Red brick color
+    pygame.draw.rect(surface, (178, 34, 34), (x, y, width, height))
+
+    # Highlight on top and left (3D effect)
+    pygame.draw.line(surface, (220, 80, 80), (x, y), (x + width - 1, y), 2)
+    pygame.draw.line(surface, (220, 80, 80), (x, y), (x, y + height - 1), 2)
+
+    # Shadow on bottom and right (3D effect)
+    pygame.draw.line(surface, (100, 20, 20), (x, y + height - 1), (x + width - 1, y + height - 1), 2)
+    pygame.draw.line(surface, (100, 20, 20), (x + width - 1, y), (x + width - 1, y + height - 1), 2)
+
+    # Dark outline for each brick
+    pygame.draw.rect(surface, (80, 15, 15), (x, y, width, height), 1)
+
+
+def draw_whole_brick():
+    """Draw a brick that is not cut short; its shadow lines spill one pixel right of and below it"""
+    surface = pygame.Surface((BRICK_WIDTH + 1, BRICK_HEIGHT + 1), pygame.SRCALPHA)
+    draw_brick(surface, 0, 0, BRICK_WIDTH, BRICK_HEIGHT)
+    return surface
+
+
+def draw_sprites(fruit_colors):
+    """Render every atlas sprite: name -> (surface, offset of its top-left from the entity's position)"""
+    sprites = {}
+    for side, direction in (("left", -1), ("right", 1)):
+        for frame in range(4):
+            sprites[f"enemy_{side}_{frame}"] = (draw_enemy(direction, frame), (0, 0))
+    sprites["dead_enemy"] = (draw_dead_enemy(), (0, 0))
+    for index, color in enumerate(fruit_colors):
+        sprites[f"fruit_{index}"] = (draw_fruit(color), (-2, -2))
+    sprites["trophy"] = (draw_trophy(), (-4, 0))
+    sprites["brick"] = (draw_whole_brick(), (0, 0))
+    return sprites
+
+
+def bake_atlas(fruit_colors):
+    """Pack every sprite into one image; returns (image, index) with the index as saved in atlas.json"""
+    sprites = draw_sprites(fruit_colors)
+
+    # Shelf packing: tallest first, left to right, starting a new row when one fills up
+    placements = {}
+    x = y = row_height = 0
+    for name, (surface, _) in sorted(sprites.items(), key=lambda item: -item[1][0].get_height()):
+        width, height = surface.get_size()
+        if x + width > ATLAS_WIDTH:
+            x = 0
+            y += row_height + ATLAS_PADDING
+            row_height = 0
+        placements[name] = (x, y, width, height)
+        x += width + ATLAS_PADDING
+        row_height = max(row_height, height)
+
+    image = pygame.Surface((ATLAS_WIDTH, y + row_height), pygame.SRCALPHA)
+    index = {"version": ATLAS_VERSION, "fruit_colors": [list(color) for color in fruit_colors], "sprites": {}}
+    for name, (surface, offset) in sprites.items():
+        rect = placements[name]
+        image.blit(surface, rect[:2])
+        index["sprites"][name] = {"rect": list(rect), "offset": list(offset)}
+    return image, index
+
 
-# Head (circle)
-pygame.draw.circle(sprite_surface, LIGHT_ORANGE, (16, 8), 8)
+def save_atlas(fruit_colors, image_path=ATLAS_IMAGE, index_path=ATLAS_INDEX):
+    image, index = bake_atlas(fruit_colors)
+    pygame.image.save(image, image_path)
+    with open(index_path, "w") as index_file:
+        # One sprite per line, so the index stays readable and diffs well
+        sprites = ",\n".join(f"    {json.dumps(name)}: {json.dumps(entry)}" for name, entry in index["sprites"].items())
+        index_file.write(f'{{"version": {index["version"]}, "fruit_colors": {json.dumps(index["fruit_colors"])},\n'
+                         f' "sprites": {{\n{sprites}\n}}}}\n')
+    return image, index
 
-# Eyes
-pygame.draw.circle(sprite_surface, WHITE, (13, 6), 2)
-pygame.draw.circle(sprite_surface, WHITE, (19, 6), 2)
-pygame.draw.circle(sprite_surface, BLACK, (14, 6), 1)
-pygame.draw.circle(sprite_surface, BLACK, (20, 6), 1)
 
-# Mouth (small smile)
-pygame.draw.arc(sprite_surface, BLACK, (14, 8, 4, 3), 0, 3.14, 1)
+def main():
+    # Initialize Pygame
+    pygame.init()
 
-# Arms
-pygame.draw.circle(sprite_surface, ORANGE, (8, 16), 3)
-pygame.draw.circle(sprite_surface, ORANGE, (24, 16), 3)
+    # Save the sprite
+    pygame.image.save(draw_player(), 'player.png')
+    print("Player sprite created as 'player.png'")
+    print("You can now run the game and it will use this image!")
+    print("Feel free to replace player.png with your own custom artwork.")
 
-# Legs
-pygame.draw.rect(sprite_surface, DARK_ORANGE, (12, 28, 3, 4))
-pygame.draw.rect(sprite_surface, DARK_ORANGE, (17, 28, 3, 4))
+    # The fruit colors belong to the game; importing it only here keeps this module importable by the game
+    from rainbow_islands_game import FRUIT_COLORS
+    image, index = save_atlas(FRUIT_COLORS)
+    print(f"Sprite atlas created as '{os.path.basename(ATLAS_IMAGE)}' ({image.get_width()}x{image.get_height()}, "
+          f"{len(index['sprites'])} sprites) with its index in '{os.path.basename(ATLAS_INDEX)}'")
 
-# Add some shading/highlights
-pygame.draw.circle(sprite_surface, LIGHT_ORANGE, (13, 5), 1)  # Eye highlight
-pygame.draw.circle(sprite_surface, LIGHT_ORANGE, (19, 5), 1)  # Eye highlight
+    pygame.quit()
 
-# Save the sprite
-pygame.image.save(sprite_surface, 'player.png')
-print("Player sprite created as 'player.png'")
-print("You can now run the game and it will use this image!")
-print("Feel free to replace player.png with your own custom artwork.")
 
-pygame.quit()
+if __name__ == "__main__":
+    main()
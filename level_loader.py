@@ -0,0 +1,190 @@
+"""
+Level files for Rainbow Islands.
+
+Each level is a JSON file in the levels/ directory:
+
+    {
+        "name": "Learning the Ropes",
+        "height": 600,              (world height in pixels; optional, one screen by default)
+        "player_start": [x, y],
+        "platforms": [[x, y, width, height], ...],
+        "enemies": [[x, y, patrol_start, patrol_end], ...],
+        "trophy": [x, y]            (or null for no trophy)
+    }
+
+levels/index.json lists the level files in play order: {"levels": ["level1.json", ...]}.
+
+The first time a level is loaded, its JSON is compiled into a binary cache in
+levels/__cache__/. Later loads read that cache straight into arrays, without any JSON parsing.
+A cache is rebuilt whenever its JSON file changes. Run this module to compile every level
+ahead of time.
+"""
+
+import json
+import os
+import struct
+import sys
+from array import array
+
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+CACHE_DIR_NAME = "__cache__"
+DEFAULT_HEIGHT = 600  # One screen
+
+
+class LevelData:
+    """One level's contents, with platforms and enemies kept as flat arrays of numbers"""
+    __slots__ = ("name", "height", "player_start", "platforms", "enemies", "trophy")
+
+    def __init__(self, name, height, player_start, platforms, enemies, trophy):
+        self.name = name
+        self.height = height  # World height in pixels; y runs from 0 at the top to height at the bottom
+        self.player_start = player_start  # (x, y)
+        self.platforms = platforms  # array("i"): x, y, width, height for each platform in turn
+        self.enemies = enemies  # array("d"): x, y, patrol_start, patrol_end for each enemy in turn
+        self.trophy = trophy  # (x, y) or None
+
+    def platform_rects(self):
+        """Iterate over (x, y, width, height) for every platform"""
+        values = iter(self.platforms)
+        return zip(values, values, values, values)
+
+    def enemy_patrols(self):
+        """Iterate over (x, y, patrol_start, patrol_end) for every enemy"""
+        values = iter(self.enemies)
+        return zip(values, values, values, values)
+
+
+def parse_level(path):
+    """Read a level's JSON file"""
+    with open(path) as level_file:
+        data = json.load(level_file)
+    platforms = array("i")
+    for platform in data["platforms"]:
+        if len(platform) != 4:
+            raise ValueError(f"{path}: platforms need [x, y, width, height], got {platform}")
+        platforms.extend(platform)
+    enemies = array("d")
+    for enemy in data.get("enemies", []):
+        if len(enemy) != 4:
+            raise ValueError(f"{path}: enemies need [x, y, patrol_start, patrol_end], got {enemy}")
+        enemies.extend(enemy)
+    height = int(data.get("height", DEFAULT_HEIGHT))
+    player_start = tuple(float(value) for value in data.get("player_start", (100, 500)))
+    trophy = data.get("trophy")
+    return LevelData(data.get("name", ""), height, player_start, platforms, enemies,
+                     tuple(float(value) for value in trophy) if trophy else None)
+
+
+# Cache file header (little-endian): magic, format version, size and modification time of the
+# JSON it was compiled from, world height, player start, trophy flag and position, name length,
+# platform count and enemy count. The name (UTF-8), platform ints and enemy doubles follow.
+CACHE_MAGIC = b"RILV"
+CACHE_VERSION = 2
+CACHE_HEADER = struct.Struct("<4sHqqIddBddIII")
+
+
+def cache_path(path):
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, CACHE_DIR_NAME, os.path.splitext(filename)[0] + ".lvl")
+
+
+def write_cache(path, level, source_stat):
+    """Compile a level into its binary cache file"""
+    name = level.name.encode("utf-8")
+    platforms = array("i", level.platforms)
+    enemies = array("d", level.enemies)
+    if sys.byteorder == "big":
+        platforms.byteswap()
+        enemies.byteswap()
+    trophy = level.trophy or (0, 0)
+    header = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, source_stat.st_size, source_stat.st_mtime_ns,
+                               level.height, level.player_start[0], level.player_start[1], level.trophy is not None,
+                               trophy[0], trophy[1], len(name), len(platforms) // 4, len(enemies) // 4)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first so an interrupted write never leaves a broken cache behind
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as cache_file:
+        cache_file.write(header)
+        cache_file.write(name)
+        cache_file.write(platforms.tobytes())
+        cache_file.write(enemies.tobytes())
+    os.replace(temporary_path, path)
+
+
+def read_cache(path, source_stat):
+    """Load a level from its cache file, or return None if it is missing or out of date"""
+    try:
+        with open(path, "rb") as cache_file:
+            data = cache_file.read()
+    except OSError:
+        return None
+    if len(data) < CACHE_HEADER.size:
+        return None
+    (magic, version, source_size, source_mtime, height, start_x, start_y, has_trophy, trophy_x, trophy_y,
+     name_length, platform_count, enemy_count) = CACHE_HEADER.unpack_from(data)
+    if (magic != CACHE_MAGIC or version != CACHE_VERSION or
+            source_size != source_stat.st_size or source_mtime != source_stat.st_mtime_ns):
+        return None
+
+    offset = CACHE_HEADER.size
+    name = data[offset:offset + name_length].decode("utf-8")
+    offset += name_length
+    platforms = array("i")
+    platforms.frombytes(data[offset:offset + platform_count * 4 * platforms.itemsize])
+    offset += platform_count * 4 * platforms.itemsize
+    enemies = array("d")
+    enemies.frombytes(data[offset:offset + enemy_count * 4 * enemies.itemsize])
+    if len(platforms) != platform_count * 4 or len(enemies) != enemy_count * 4:
+        return None  # Truncated
+    if sys.byteorder == "big":
+        platforms.byteswap()
+        enemies.byteswap()
+    return LevelData(name, height, (start_x, start_y), platforms, enemies,
+                     (trophy_x, trophy_y) if has_trophy else None)
+
+
+def load_level(path):
+    """Load a level file, through its binary cache when that is up to date"""
+    source_stat = os.stat(path)
+    level = read_cache(cache_path(path), source_stat)
+    if level is None:
+        level = parse_level(path)
+        try:
+            write_cache(cache_path(path), level, source_stat)
+        except OSError:
+            pass  # Read-only install: keep working from the JSON
+    return level
+
+
+class LevelLibrary:
+    """The levels listed in an index file, each loaded the first time it is asked for"""
+    def __init__(self, directory=LEVELS_DIR, keep=2):
+        self.directory = directory
+        with open(os.path.join(directory, "index.json")) as index_file:
+            self.files = json.load(index_file)["levels"]
+        self.keep = keep  # Levels kept in memory, so a long level list doesn't stay resident
+        self.loaded = {}  # Level number -> LevelData, least recently used first
+
+    def __len__(self):
+        return len(self.files)
+
+    def get(self, number):
+        """Return the LevelData for a level number (counting from 1)"""
+        if not 1 <= number <= len(self.files):
+            raise ValueError(f"There is no level {number}; the index lists {len(self.files)}")
+        level = self.loaded.pop(number, None)
+        if level is None:
+            level = load_level(os.path.join(self.directory, self.files[number - 1]))
+        self.loaded[number] = level
+        while len(self.loaded) > self.keep:
+            del self.loaded[next(iter(self.loaded))]
+        return level
+
+
+if __name__ == "__main__":
+    # Compile every level listed in the index, so the first play doesn't have to
+    library = LevelLibrary(sys.argv[1] if len(sys.argv) > 1 else LEVELS_DIR)
+    for number, filename in enumerate(library.files, start=1):
+        level = library.get(number)
+        print(f"Level {number} ({filename}): {level.height} pixels tall, {len(level.platforms) // 4} platforms, "
+              f"{len(level.enemies) // 4} enemies")
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Two-player Rainbow Islands over UDP, with rollback netcode.
+
+Each peer runs the whole game and sends the other its inputs every frame. Local input is
+applied at once: the peer's input for frames it hasn't heard about yet is predicted (the keys
+it was last holding), and when the real input turns out different, the game is restored from
+the snapshot taken before that frame and played forwards again with what actually happened.
+Peers never get more than MAX_ROLLBACK frames ahead of what they have heard; past that they
+wait. Every packet repeats all the inputs the other side hasn't acknowledged, so lost packets
+cost nothing but a little more prediction, and carries a checksum of a confirmed frame so a
+desync is reported instead of going unnoticed.
+
+Play on two machines (or in two terminals):
+
+    python netplay.py --player 1 --listen 7000 --peer otherhost:7001
+    python netplay.py --player 2 --listen 7001 --peer firsthost:7000
+
+Both peers need the same --seed and levels. --latency, --jitter and --loss hold back and drop
+outgoing packets, to try bad connections on one machine. --loopback plays both peers headless
+in one process over UDP on 127.0.0.1, with scripted inputs, and checks they stayed in sync.
+"""
+
+import argparse
+import heapq
+import random
+import socket
+import struct
+import sys
+import time
+import zlib
+
+import pygame
+
+from level_loader import LEVELS_DIR
+from rainbow_islands_game import Game, Input, FPS, SIM_DT, MAX_STEPS_PER_FRAME
+
+MAX_ROLLBACK = 8  # Frames played on predicted input before waiting for the peer
+HELD_INPUTS = Input.LEFT | Input.RIGHT | Input.JUMP  # Keys that are held, so worth predicting as still held
+CHECKSUMS_KEPT = 4 * FPS  # Confirmed frames whose checksums are kept for comparing with the peer
+
+# Packet layout (little-endian): magic, first frame of the inputs carried, how many inputs,
+# how many of the receiver's inputs the sender has (its acknowledgement), and the frame and
+# checksum of the sender's latest confirmed frame (frame 0 with no checksum yet). One input
+# byte per frame follows.
+PACKET_MAGIC = b"RINP"
+PACKET_HEADER = struct.Struct("<4sIBIII")
+MAX_PACKET_INPUTS = 255
+
+
+class LossyLink:
+    """A UDP socket that holds back and drops outgoing packets, to imitate a real connection"""
+    def __init__(self, sock, peer, latency_ms=0, jitter_ms=0, loss=0.0, seed=None, clock=time.perf_counter):
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.peer = peer
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.clock = clock  # The loopback test runs on a simulated clock, faster than real time
+        self.queue = []  # Packets waiting out their latency: (send time, sequence number, data)
+        self.sequence = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, data):
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        delay = max(self.latency + self.rng.uniform(-self.jitter, self.jitter), 0)
+        heapq.heappush(self.queue, (self.clock() + delay, self.sequence, data))
+        self.sequence += 1
+        self.flush()
+
+    def flush(self):
+        """Send the packets whose latency is up"""
+        now = self.clock()
+        while self.queue and self.queue[0][0] <= now:
+            self.sock.sendto(heapq.heappop(self.queue)[2], self.peer)
+            self.sent += 1
+
+    def receive(self):
+        """Return every packet that has arrived"""
+        self.flush()
+        packets = []
+        while True:
+            try:
+                packets.append(self.sock.recv(2048))
+            except BlockingIOError:
+                return packets
+            except ConnectionResetError:
+                continue  # The peer isn't listening yet (reported on Windows)
+
+
+class RollbackSession:
+    """Keeps a two-player Game in step with a remote peer, rolling back when predictions were wrong"""
+    def __init__(self, game, local_player, link, max_rollback=MAX_ROLLBACK):
+        self.game = game
+        self.link = link
+        self.local = local_player  # Index into game.players
+        self.max_rollback = max_rollback
+        self.frame = 0  # Next frame to play
+        self.local_inputs = bytearray()  # Our input for every frame played
+        self.remote_inputs = bytearray()  # The peer's input for every frame heard about so far, in order
+        self.early_inputs = {}  # Frame -> peer input that arrived ahead of a gap left by a lost packet
+        self.predicted = {}  # Frame -> the peer input guessed when the frame was played, until confirmed
+        self.snapshots = {}  # Frame -> game state before it was played, while it may need replaying
+        self.acknowledged = 0  # How many of our inputs the peer has
+        self.rollback_from = None  # Earliest frame played on a wrong guess
+
+        # Checksums of frames played with both real inputs, compared with the peer's
+        self.confirmed = 0  # Frames checksummed so far
+        self.checksums = {}
+        self.peer_checksums = {}
+        self.desync_frame = None
+
+        # Statistics
+        self.rollbacks = 0
+        self.frames_replayed = 0
+        self.longest_rollback = 0  # Frames
+        self.rollback_ms = []  # Time taken by each rollback
+        self.stalls = 0  # Ticks spent waiting for the peer
+
+    def remote_input(self, frame):
+        """The peer's real input for a frame, or a prediction while it hasn't arrived"""
+        if frame < len(self.remote_inputs):
+            return self.remote_inputs[frame]
+        # Presses (shots, menu keys) are one-offs, but held keys usually stay held
+        guess = self.remote_inputs[-1] & HELD_INPUTS if self.remote_inputs else Input.NONE
+        self.predicted[frame] = guess
+        return guess
+
+    def play(self, frame):
+        """Snapshot the game, then play one frame"""
+        self.snapshots[frame] = self.game.snapshot()
+        inputs = [Input.NONE, Input.NONE]
+        inputs[self.local] = self.local_inputs[frame]
+        inputs[1 - self.local] = self.remote_input(frame)
+        self.game.step(tuple(inputs))
+
+    def receive(self):
+        """Take in the peer's packets, noting the first frame that was played on a wrong guess"""
+        for data in self.link.receive():
+            if len(data) < PACKET_HEADER.size:
+                continue
+            magic, first, count, acknowledged, sync_frame, sync_checksum = PACKET_HEADER.unpack_from(data)
+            if magic != PACKET_MAGIC or len(data) < PACKET_HEADER.size + count:
+                continue
+            self.acknowledged = max(self.acknowledged, acknowledged)
+            if sync_frame:
+                self.peer_checksums[sync_frame - 1] = sync_checksum
+            inputs = data[PACKET_HEADER.size:PACKET_HEADER.size + count]
+            for frame in range(max(first, len(self.remote_inputs)), first + count):
+                self.early_inputs[frame] = inputs[frame - first]
+
+        while len(self.remote_inputs) in self.early_inputs:
+            frame = len(self.remote_inputs)
+            remote = self.early_inputs.pop(frame)
+            self.remote_inputs.append(remote)
+            guess = self.predicted.pop(frame, None)
+            if guess is not None and guess != remote and self.rollback_from is None:
+                self.rollback_from = frame
+
+    def roll_back(self):
+        """Return to the first mispredicted frame and play forwards again with the real inputs"""
+        start = time.perf_counter()
+        frame = self.rollback_from
+        self.rollback_from = None
+        self.game.restore(self.snapshots[frame])
+        replayed = self.frame - frame
+        for replay in range(frame, self.frame):
+            if replay == self.frame - 1:
+                self.game.save_positions()  # Draw between the last two frames, as if nothing happened
+            self.play(replay)
+        self.rollbacks += 1
+        self.frames_replayed += replayed
+        self.longest_rollback = max(self.longest_rollback, replayed)
+        self.rollback_ms.append((time.perf_counter() - start) * 1000)
+
+    def advance(self, inputs):
+        """Play the next frame with our inputs; returns False while waiting for the peer instead
+        
+        With inputs None, only keeps in touch with the peer, without playing on.
+        """
+        self.receive()
+        if self.rollback_from is not None:
+            self.roll_back()
+
+        advanced = inputs is not None and self.frame - len(self.remote_inputs) < self.max_rollback
+        if advanced:
+            self.local_inputs.append(inputs & ~Input.REWIND)  # Nobody can rewind a shared game
+            self.game.save_positions()
+            self.play(self.frame)
+            self.frame += 1
+        elif inputs is not None:
+            self.stalls += 1
+        self.check_sync()
+        self.send()
+        self.forget()
+        return advanced
+
+    def check_sync(self):
+        """Checksum newly confirmed frames and compare them with the peer's"""
+        # A frame's end state is the snapshot taken before the next one
+        while self.confirmed < min(len(self.remote_inputs), self.frame - 1):
+            self.checksums[self.confirmed] = zlib.crc32(self.snapshots[self.confirmed + 1])
+            self.confirmed += 1
+        for frame in [frame for frame in self.peer_checksums if frame in self.checksums]:
+            if self.peer_checksums.pop(frame) != self.checksums[frame] and self.desync_frame is None:
+                self.desync_frame = frame
+
+    def send(self):
+        first = self.acknowledged
+        count = min(self.frame - first, MAX_PACKET_INPUTS)
+        sync_checksum = self.checksums[self.confirmed - 1] if self.confirmed else 0
+        self.link.send(PACKET_HEADER.pack(PACKET_MAGIC, first, count, len(self.remote_inputs), self.confirmed,
+                                          sync_checksum) + self.local_inputs[first:first + count])
+
+    def forget(self):
+        """Drop snapshots no rollback or checksum can need any more, and old checksums"""
+        keep_from = min(len(self.remote_inputs), self.confirmed + 1)
+        for frame in [frame for frame in self.snapshots if frame < keep_from]:
+            del self.snapshots[frame]
+        for frame in [frame for frame in self.checksums if frame < self.confirmed - CHECKSUMS_KEPT]:
+            del self.checksums[frame]
+        for frame in [frame for frame in self.peer_checksums if frame < self.confirmed - CHECKSUMS_KEPT]:
+            del self.peer_checksums[frame]
+
+    def report(self):
+        ordered = sorted(self.rollback_ms) or [0.0]
+        return (f"{self.frame} frames, {self.rollbacks} rollbacks replaying {self.frames_replayed} frames "
+                f"(longest {self.longest_rollback}), rollback ms mean {sum(ordered) / len(ordered):.2f} "
+                f"p99 {ordered[int(0.99 * (len(ordered) - 1))]:.2f} max {ordered[-1]:.2f} "
+                f"(frame budget {SIM_DT * 1000:.1f}), {self.stalls} stalls, "
+                f"{self.link.dropped} of {self.link.dropped + self.link.sequence} packets dropped")
+
+
+def open_socket(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1" if port == 0 else "", port))
+    return sock
+
+
+def scripted_inputs(rng):
+    """Endless bot inputs for the loopback test: runs of held moves, hops and shots"""
+    while True:
+        move = rng.choice([Input.NONE, Input.LEFT, Input.RIGHT, Input.RIGHT])
+        for _ in range(rng.randint(5, 40)):
+            inputs = move
+            if rng.random() < 0.08:
+                inputs |= Input.JUMP
+            if rng.random() < 0.1:
+                inputs |= Input.SHOOT
+            if rng.random() < 0.01:
+                inputs |= Input.RESTART  # Only does something after a game over
+            yield inputs
+
+
+def run_loopback(args):
+    """Play both peers in this process over UDP loopback and check they agree; returns an exit status"""
+    now = 0.0
+    clock = lambda: now  # Simulated time, one frame per tick, so the test runs flat out
+    first, second = open_socket(0), open_socket(0)
+    links = [LossyLink(first, second.getsockname(), args.latency, args.jitter, args.loss, seed=1, clock=clock),
+             LossyLink(second, first.getsockname(), args.latency, args.jitter, args.loss, seed=2, clock=clock)]
+    sessions = [RollbackSession(Game(headless=True, seed=args.seed, levels_dir=args.levels_dir, rewind_seconds=0,
+                                     players=2), player, link)
+                for player, link in enumerate(links)]
+    bots = [scripted_inputs(random.Random(player)) for player in range(2)]
+    waiting = [None, None]  # Input a stalled peer still has to play
+
+    # Play until both peers have confirmed every frame but the last (whose end state has no snapshot)
+    start = time.perf_counter()
+    tick = 0
+    while min(session.confirmed for session in sessions) < args.frames - 1:
+        now = tick * SIM_DT
+        for index, session in enumerate(sessions):
+            if session.frame < args.frames:
+                inputs = waiting[index] if waiting[index] is not None else next(bots[index])
+                waiting[index] = None if session.advance(inputs) else inputs
+            else:
+                session.advance(None)
+        tick += 1
+        if tick > args.frames * 4:
+            print("The peers stopped hearing from each other")
+            return 1
+    elapsed = time.perf_counter() - start
+
+    # Both peers must also match one game played in lockstep with everyone's real inputs
+    reference = Game(headless=True, seed=args.seed, levels_dir=args.levels_dir, rewind_seconds=0, players=2)
+    inputs = list(zip(sessions[0].local_inputs, sessions[1].local_inputs))
+    reference_checksums = {}
+    for frame in range(args.frames - 1):
+        reference.step(inputs[frame])
+        reference_checksums[frame] = zlib.crc32(reference.snapshot())
+
+    status = 0
+    for player, session in enumerate(sessions, start=1):
+        print(f"Player {player}: {session.report()}")
+        mismatched = [frame for frame, checksum in session.checksums.items()
+                      if reference_checksums.get(frame, checksum) != checksum]
+        if session.desync_frame is not None or mismatched:
+            print(f"  DESYNC at frame {session.desync_frame if session.desync_frame is not None else mismatched[0]}")
+            status = 1
+    if status == 0:
+        print(f"Both peers stayed in sync with a lockstep replay of their inputs over {args.frames} frames "
+              f"({elapsed:.1f}s for both peers; final state {reference.state.name}, scores {reference.scores})")
+    for sock in (first, second):
+        sock.close()
+    return status
+
+
+def run_window(args):
+    """Play one peer in a window"""
+    host, _, port = args.peer.rpartition(":")
+    link = LossyLink(open_socket(args.listen), (host or "127.0.0.1", int(port)), args.latency, args.jitter, args.loss)
+    game = Game(seed=args.seed, levels_dir=args.levels_dir, rewind_seconds=0, players=2)
+    game.camera_player = args.player - 1
+    session = RollbackSession(game, args.player - 1, link)
+
+    running = True
+    accumulator = 0.0
+    last_time = time.perf_counter()
+    last_report = last_time
+    profiler = game.profiler
+    while running:
+        profiler.begin_frame()
+        running = game.handle_events()
+        profiler.lap("events")
+        now = time.perf_counter()
+        accumulator = min(accumulator + now - last_time, MAX_STEPS_PER_FRAME * SIM_DT)
+        last_time = now
+        while accumulator >= SIM_DT:
+            # Presses stay with the keyboard until a frame is actually played with them
+            if session.advance(game.keyboard.peek()):
+                game.keyboard.take()
+            accumulator -= SIM_DT
+        link.flush()
+        game.draw(accumulator / SIM_DT)
+        game.clock.tick(game.render_fps)
+        profiler.lap("tick")
+        profiler.end_frame()
+
+        if now - last_report >= 1:
+            pygame.display.set_caption(f"Rainbow Islands - player {args.player} - frame {session.frame}, "
+                                       f"{session.rollbacks} rollbacks, {session.stalls} stalls"
+                                       + (" - DESYNC" if session.desync_frame is not None else ""))
+            last_report = now
+    print(session.report())
+    if session.desync_frame is not None:
+        print(f"Desynchronised at frame {session.desync_frame}")
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-player Rainbow Islands over UDP with rollback netcode")
+    parser.add_argument("--player", type=int, choices=(1, 2), default=1, help="which player this peer is")
+    parser.add_argument("--listen", type=int, default=7000, help="UDP port to receive on (default: 7000)")
+    parser.add_argument("--peer", default="127.0.0.1:7001", help="the other peer's HOST:PORT (default: 127.0.0.1:7001)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed; both peers need the same (default: 0)")
+    parser.add_argument("--levels-dir", metavar="DIR", default=LEVELS_DIR, help="directory of level files")
+    parser.add_argument("--latency", type=float, default=0, help="milliseconds to hold back each outgoing packet")
+    parser.add_argument("--jitter", type=float, default=0, help="random +/- milliseconds added to --latency")
+    parser.add_argument("--loss", type=float, default=0, help="fraction of outgoing packets to drop, e.g. 0.05")
+    parser.add_argument("--loopback", action="store_true",
+                        help="play both peers headless with scripted inputs and check they stay in sync")
+    parser.add_argument("--frames", type=int, default=3600, help="frames to play with --loopback (default: 3600)")
+    args = parser.parse_args()
+
+    if args.loopback:
+        sys.exit(run_loopback(args))
+    run_window(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
 import pygame
 import sys
+import argparse
+import csv
+import json
 import math
 import random
-from enum import Enum
+import struct
+import time
+import zlib
+from array import array
+from collections import deque
+from enum import Enum, IntFlag
+
+from create_player_sprite import ATLAS_IMAGE, ATLAS_INDEX, ATLAS_VERSION, bake_atlas, draw_brick
+from level_loader import LevelLibrary, LEVELS_DIR
+
+# NumPy is optional; it is only needed for the array-backed enemy store (--array-enemies)
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Initialize Pygame-CE
 pygame.init()
@@ -11,6 +28,18 @@ pygame.init()
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 FPS = 60
+SIM_DT = 1.0 / FPS  # Seconds of game time per simulation step; all physics is tuned per step
+MAX_STEPS_PER_FRAME = 5  # Beyond this the game slows down rather than stalling to catch up
+JUMP_BUFFER_FRAMES = 6  # A jump pressed up to this many frames before landing still happens on landing
+COYOTE_FRAMES = 6  # Frames after running off a ledge during which the player can still jump
+
+# Levels can be taller than the screen; the world is split into screen-tall horizontal chunks
+CHUNK_HEIGHT = SCREEN_HEIGHT
+ACTIVE_CHUNKS = 1  # Chunks above and below the player's that are updated every frame; the rest lie dormant
+RAINBOW_WAKE_DISTANCE = 64  # Chunks within this many pixels of a rainbow are kept awake too
+DORMANT_REFRESH_FRAMES = 120  # Dormant chunks are caught up in turn, at most one per frame, this often
+BACKGROUND_CHUNKS_KEPT = 4  # Baked background chunks kept in memory
+VIEW_MARGIN = 64  # Pixels beyond the screen edges within which objects are still drawn
 
 # Colors
 WHITE = (255, 255, 255)
@@ -25,20 +54,247 @@ ORANGE = (255, 165, 0)
 CYAN = (0, 255, 255)
 PINK = (255, 192, 203)
 GREY = (120, 120, 120)
+SKY_BLUE = (134, 206, 250)  # Light blue background #86CEFA
 
 # Rainbow colors for the rainbow bridges
 RAINBOW_COLORS = [RED, ORANGE, YELLOW, GREEN, CYAN, BLUE, PURPLE]
 
+# Colors a fruit can randomly be
+FRUIT_COLORS = [RED, ORANGE, YELLOW, GREEN, PURPLE]
+
+# Each player's color, in player order; later players start PLAYER_SPACING pixels right of the first
+PLAYER_COLORS = [ORANGE, CYAN]
+PLAYER_SPACING = 48
+FRUIT_COLOR_INDEX = {color: index for index, color in enumerate(FRUIT_COLORS)}  # For snapshots
+
 class GameState(Enum):
     PLAYING = 1
     GAME_OVER = 2
     LEVEL_COMPLETE = 3
     WIN = 4
 
+class Input(IntFlag):
+    """Per-frame player inputs, so the game can be driven without a keyboard"""
+    NONE = 0
+    LEFT = 1
+    RIGHT = 2
+    JUMP = 4
+    SHOOT = 8
+    RESTART = 16  # Menu presses are inputs too, so a recorded session replays exactly
+    NEXT_LEVEL = 32
+    REWIND = 64  # Step back a frame instead of forward
+
+def per_player(inputs, count):
+    """Inputs as a tuple of one Input per player; a lone Input is the first player's"""
+    if not isinstance(inputs, tuple):
+        inputs = (inputs,)
+    return inputs + (Input.NONE,) * (count - len(inputs))
+
+def lerp(previous, current, alpha):
+    """Position between the last two simulation steps, for drawing between them"""
+    if alpha >= 1.0:
+        return current  # Exact, so un-interpolated frames match the simulation to the pixel
+    return previous + (current - previous) * alpha
+
+def advance_patrol(x, direction, speed, low, high, frames):
+    """Return (x, direction) after frames of Enemy.update's patrol, jumping from turn to turn
+    
+    Matches frame-by-frame stepping exactly when x, the patrol ends and the speed are whole pixels
+    (tests/test_advance_patrol.py). Otherwise, one addition per frame rounds differently from one
+    per leg, and a turn decided by x landing exactly on an end can come a frame early or late.
+    """
+    while frames > 0:
+        step = speed * direction
+        if step == 0:
+            # Standing on a patrol boundary turns every frame; anywhere else, nothing happens
+            if (x <= low or x >= high) and frames % 2:
+                direction = -direction
+            break
+        # Frames until a step ends at or past a boundary (ceil() can be a frame off after float rounding)
+        steps = max(math.ceil(((high if step > 0 else low) - x) / step), 1)
+        if x + step <= low or x + step >= high:
+            steps = 1
+        elif step > 0:
+            steps += (x + steps * step < high) - (steps > 1 and x + (steps - 1) * step >= high)
+        else:
+            steps += (x + steps * step > low) - (steps > 1 and x + (steps - 1) * step <= low)
+        if steps > frames:
+            return x + frames * step, direction
+        x += steps * step
+        direction = -direction
+        frames -= steps
+    return x, direction
+
+# Keys that drive the simulation while held down
+HELD_KEYS = {
+    pygame.K_LEFT: Input.LEFT, pygame.K_a: Input.LEFT,
+    pygame.K_RIGHT: Input.RIGHT, pygame.K_d: Input.RIGHT,
+    pygame.K_SPACE: Input.JUMP, pygame.K_UP: Input.JUMP, pygame.K_w: Input.JUMP,
+    pygame.K_BACKSPACE: Input.REWIND,
+}
+# Keys that act once per press
+PRESSED_KEYS = {
+    pygame.K_x: Input.SHOOT, pygame.K_LCTRL: Input.SHOOT,
+    pygame.K_r: Input.RESTART,
+    pygame.K_SPACE: Input.NEXT_LEVEL,
+}
+
+class KeyboardInput:
+    """Collects the keyboard's events once per frame and hands the simulation steps their Input flags
+    
+    Held keys are followed through their KEYDOWN and KEYUP events rather than polled, so every step
+    of a frame sees the same keys, and a key tapped and released within one frame still reaches
+    the next step. Each frame's presses are stamped with the time they were collected, so the game
+    can measure how long they take to reach the screen.
+    """
+    def __init__(self):
+        self.keys_down = set()
+        self.held = Input.NONE  # Flags of the keys down at the last collect()
+        self.pressed = Input.NONE  # Flags pressed since a step last took them
+        self.other_presses = []  # This frame's presses of keys the simulation doesn't use (e.g. F3)
+        self.quit = False
+        self.frame_time = 0.0  # perf_counter() when this frame's events were collected
+        self.press_time = None  # Collection time of the oldest press no step has taken yet
+        self.stepped_press_time = None  # ... and of the oldest press stepped but not yet on screen
+        
+    def collect(self):
+        """Read every event waiting, once at the start of a frame"""
+        self.frame_time = time.perf_counter()
+        self.other_presses = []
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.quit = True
+            elif event.type == pygame.KEYDOWN:
+                self.keys_down.add(event.key)
+                flags = HELD_KEYS.get(event.key, Input.NONE) | PRESSED_KEYS.get(event.key, Input.NONE)
+                if flags:
+                    self.pressed |= flags
+                    if self.press_time is None:
+                        self.press_time = self.frame_time
+                else:
+                    self.other_presses.append(event.key)
+            elif event.type == pygame.KEYUP:
+                self.keys_down.discard(event.key)
+            elif event.type == pygame.WINDOWFOCUSLOST:
+                # Keys released in another window never send us their KEYUP
+                self.keys_down.clear()
+        held = Input.NONE
+        for key in self.keys_down:
+            held |= HELD_KEYS.get(key, Input.NONE)
+        self.held = held
+        
+    def peek(self):
+        """Input flags for the next simulation step, without taking them"""
+        return self.held | self.pressed
+    
+    def take(self):
+        """Input flags for the next simulation step: the keys held plus anything pressed since the last step"""
+        inputs = self.held | self.pressed
+        self.pressed = Input.NONE
+        if self.press_time is not None:
+            if self.stepped_press_time is None:
+                self.stepped_press_time = self.press_time
+            self.press_time = None
+        return inputs
+    
+    def displayed(self):
+        """Call once a frame is on screen; returns milliseconds since the oldest press it shows was collected"""
+        if self.stepped_press_time is None:
+            return None
+        latency = (time.perf_counter() - self.stepped_press_time) * 1000
+        self.stepped_press_time = None
+        return latency
+
+class SpatialHash:
+    """Uniform grid that finds the objects near a rectangle without checking every pair"""
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> set of objects overlapping that cell
+        self.object_cells = {}  # Object -> (first column, first row, last column, last row)
+        self.order = {}  # Object -> insertion number, so queries keep a stable order
+        self.next_order = 0
+        
+    def __len__(self):
+        return len(self.order)
+        
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (int(rect[0] // size), int(rect[1] // size),
+                int((rect[0] + rect[2]) // size), int((rect[1] + rect[3]) // size))
+    
+    def add_to_cells(self, obj, cells):
+        first_col, first_row, last_col, last_row = cells
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                cell = self.cells.get((col, row))
+                if cell is None:
+                    cell = self.cells[(col, row)] = set()
+                cell.add(obj)
+        self.object_cells[obj] = cells
+    
+    def remove_from_cells(self, obj):
+        first_col, first_row, last_col, last_row = self.object_cells.pop(obj)
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                cell = self.cells[(col, row)]
+                cell.discard(obj)
+                if not cell:
+                    del self.cells[(col, row)]
+        
+    def insert(self, obj, rect):
+        self.add_to_cells(obj, self.cell_range(rect))
+        self.order[obj] = self.next_order
+        self.next_order += 1
+        
+    def remove(self, obj):
+        if obj in self.object_cells:
+            self.remove_from_cells(obj)
+            del self.order[obj]
+    
+    def move(self, obj, rect):
+        """Update an object's position, touching the grid only when it changes cells"""
+        cells = self.cell_range(rect)
+        if cells != self.object_cells[obj]:
+            self.remove_from_cells(obj)
+            self.add_to_cells(obj, cells)
+    
+    def clear(self):
+        self.cells.clear()
+        self.object_cells.clear()
+        self.order.clear()
+        self.next_order = 0
+        
+    def query(self, rect):
+        """Return the objects that may overlap rect, in the order they were inserted"""
+        if not self.order:
+            return []
+        first_col, first_row, last_col, last_row = self.cell_range(rect)
+        if first_col == last_col and first_row == last_row:
+            # Small queries usually fall inside a single cell
+            cell = self.cells.get((first_col, first_row))
+            if not cell:
+                return []
+            return sorted(cell, key=self.order.__getitem__)
+        found = set()
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                cell = self.cells.get((col, row))
+                if cell:
+                    found.update(cell)
+        return sorted(found, key=self.order.__getitem__)
+
 class Player:
-    def __init__(self, x, y):
+    # Entities use __slots__ instead of a per-instance __dict__: smaller objects and faster attribute access
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'width', 'height', 'vel_x', 'vel_y', 'speed', 'jump_power',
+                 'gravity', 'on_ground', 'facing_right', 'rainbow_cooldown', 'shot_cooldown', 'sprite_image',
+                 'sprite_image_flipped', 'color', 'jump_buffer', 'coyote_frames')
+    
+    def __init__(self, x, y, color=ORANGE):
+        self.color = color  # Other players are tinted, so everyone can tell who is who
         self.x = x
         self.y = y
+        self.prev_x = x  # Position before the last simulation step, for interpolated drawing
+        self.prev_y = y
         self.width = 32
         self.height = 32
         self.vel_x = 0
@@ -47,17 +303,24 @@ class Player:
         self.jump_power = -8
         self.gravity = 0.5
         self.on_ground = False
+        self.jump_buffer = 0  # Frames left in which a recent jump press still counts
+        self.coyote_frames = 0  # Frames left in which the player can still jump after leaving the ground
         self.facing_right = True
         self.rainbow_cooldown = 0
+        self.shot_cooldown = 30  # Frames between rainbow shots
         
-        # Try to load player sprite image
+        # Try to load player sprite image (needs a window to convert it for)
         self.sprite_image = None
         self.sprite_image_flipped = None
+        if pygame.display.get_surface() is None:
+            return
         try:
             # Try to load player sprite (you can replace 'player.png' with your image filename)
             self.sprite_image = pygame.image.load('player.png').convert_alpha()
             # Scale the image to match player dimensions
             self.sprite_image = pygame.transform.scale(self.sprite_image, (self.width, self.height))
+            if color != ORANGE:
+                self.sprite_image.fill(color, special_flags=pygame.BLEND_RGB_MULT)
             # Create flipped version for left-facing direction
             self.sprite_image_flipped = pygame.transform.flip(self.sprite_image, True, False)
             print("Player sprite loaded successfully!")
@@ -65,21 +328,28 @@ class Player:
             print("Player sprite not found, using drawn sprite instead")
             self.sprite_image = None
         
-    def update(self, platforms, rainbows):
+    def update(self, platforms, rainbows, inputs, world_height=SCREEN_HEIGHT):
         # Handle input
-        keys = pygame.key.get_pressed()
         self.vel_x = 0
         
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        if inputs & Input.LEFT:
             self.vel_x = -self.speed
             self.facing_right = False
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if inputs & Input.RIGHT:
             self.vel_x = self.speed
             self.facing_right = True
-        if (keys[pygame.K_SPACE] or keys[pygame.K_UP] or keys[pygame.K_w]) and self.on_ground:
+        # Jump presses are remembered for a few frames, so one made just before landing isn't lost,
+        # and the ground stays jumpable for a few frames after running off it
+        if inputs & Input.JUMP:
+            self.jump_buffer = JUMP_BUFFER_FRAMES
+        if self.jump_buffer and (self.on_ground or self.coyote_frames):
             self.vel_y = self.jump_power
             self.on_ground = False
-            
+            self.jump_buffer = 0
+            self.coyote_frames = 0
+        elif self.jump_buffer and not inputs & Input.JUMP:
+            self.jump_buffer -= 1  # Counted from the frame after the press
+
         # Update rainbow cooldown
         if self.rainbow_cooldown > 0:
             self.rainbow_cooldown -= 1
@@ -97,15 +367,13 @@ class Player:
         
         # First check if player is currently on a rainbow
         on_rainbow = False
-        for rainbow in rainbows:
+        player_center_x = self.x + self.width // 2
+        rainbow_tops = {}  # Rainbow -> its surface height under the player's centre
+        for rainbow in rainbows.query(player_rect.inflate(0, 20)):
             if rainbow.solid and not rainbow.dissolving:
-                player_center_x = self.x + self.width // 2
                 if rainbow.x <= player_center_x <= rainbow.x + rainbow.bridge_width:
                     # Calculate if player is actually on this rainbow surface
-                    x_progress = (player_center_x - rainbow.x) / rainbow.bridge_width
-                    arc_height = 20
-                    arc_y_offset = arc_height * math.sin(x_progress * math.pi)
-                    rainbow_top_y = rainbow.y - arc_y_offset
+                    rainbow_top_y = rainbow_tops[rainbow] = rainbow.surface_y(player_center_x)
                     
                     # Check if player is close to the rainbow surface
                     if abs(self.y + self.height - rainbow_top_y) < 10:
@@ -114,7 +382,7 @@ class Player:
         
         # Only apply platform collisions if NOT on a rainbow
         if not on_rainbow:
-            for platform in platforms:
+            for platform in platforms.query(player_rect):
                 platform_rect = pygame.Rect(platform.x, platform.y, platform.width, platform.height)
                 if player_rect.colliderect(platform_rect):
                     # Landing on top of platform
@@ -131,17 +399,20 @@ class Player:
         # Check rainbow collisions (rainbows act as platforms)
         jumped_on_rainbow = None
         
-        for rainbow in rainbows:
+        if self.x + self.width // 2 != player_center_x:
+            # A platform pushed the player sideways, so the surface heights found above are stale
+            player_center_x = self.x + self.width // 2
+            rainbow_tops.clear()
+        
+        nearby_rect = pygame.Rect(self.x, self.y, self.width, self.height).inflate(0, 20)
+        for rainbow in rainbows.query(nearby_rect):
             if rainbow.solid and not rainbow.dissolving:
-                player_center_x = self.x + self.width // 2
-                
                 # Check if player is horizontally within the rainbow bridge
                 if rainbow.x <= player_center_x <= rainbow.x + rainbow.bridge_width:
-                    # Calculate the arc height at the player's position
-                    x_progress = (player_center_x - rainbow.x) / rainbow.bridge_width
-                    arc_height = 20
-                    arc_y_offset = arc_height * math.sin(x_progress * math.pi)
-                    rainbow_top_y = rainbow.y - arc_y_offset
+                    # Reuse the arc height at the player's position if the first pass found it
+                    rainbow_top_y = rainbow_tops.get(rainbow)
+                    if rainbow_top_y is None:
+                        rainbow_top_y = rainbow.surface_y(player_center_x)
                     
                     # Create collision rect for the rainbow at this position
                     rainbow_rect = pygame.Rect(player_center_x - 10, rainbow_top_y, 20, rainbow.bridge_height)
@@ -175,23 +446,30 @@ class Player:
                         
                         break  # Only collide with one rainbow at a time
         
+        # Count down the coyote time once the player is off the ground
+        if self.on_ground:
+            self.coyote_frames = COYOTE_FRAMES
+        elif self.coyote_frames:
+            self.coyote_frames -= 1
+        
         # Keep player on screen
         if self.x < 0:
             self.x = 0
         elif self.x > SCREEN_WIDTH - self.width:
             self.x = SCREEN_WIDTH - self.width
             
-        # Check if player fell off screen
-        if self.y > SCREEN_HEIGHT:
+        # Check if player fell off the bottom of the level
+        if self.y > world_height:
             return False
             
         # Return the rainbow that was jumped on, or True if no special event
         return jumped_on_rainbow if jumped_on_rainbow else True
     
-    def shoot_rainbow(self):
+    def shoot_rainbow(self, pool=None):
+        """Return a new rainbow projectile, taken from pool if one is given, or None while cooling down"""
         offset = 34
         if self.rainbow_cooldown <= 0:
-            self.rainbow_cooldown = 30  # Cooldown frames
+            self.rainbow_cooldown = self.shot_cooldown
             direction = 1 if self.facing_right else -1
             # Spawn rainbow right next to character
             if self.facing_right:
@@ -199,43 +477,51 @@ class Player:
             else:
                 spawn_x = self.x - offset  # Left edge of character
             spawn_y = self.y + self.height - 2
+            if pool is not None:
+                return pool.acquire(spawn_x, spawn_y, direction)
             return Rainbow(spawn_x, spawn_y, direction)
         return None
     
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0, camera_y=0):
+        x = lerp(self.prev_x, self.x, alpha)
+        y = lerp(self.prev_y, self.y, alpha) - camera_y  # Screen position
         if self.sprite_image:
             # Use image sprite
             if self.facing_right:
-                screen.blit(self.sprite_image, (self.x, self.y))
+                return screen.blit(self.sprite_image, (x, y))
             else:
-                screen.blit(self.sprite_image_flipped, (self.x, self.y))
+                return screen.blit(self.sprite_image_flipped, (x, y))
         else:
             # Fallback to drawn sprite
-            color = ORANGE
-            pygame.draw.rect(screen, color, (self.x, self.y, self.width, self.height))
+            body_rect = pygame.draw.rect(screen, self.color, (x, y, self.width, self.height))
             # Draw eyes
             eye_size = 4
             if self.facing_right:
-                pygame.draw.circle(screen, WHITE, (int(self.x + 20), int(self.y + 10)), eye_size)
-                pygame.draw.circle(screen, BLACK, (int(self.x + 22), int(self.y + 10)), 2)
+                pygame.draw.circle(screen, WHITE, (int(x + 20), int(y + 10)), eye_size)
+                pygame.draw.circle(screen, BLACK, (int(x + 22), int(y + 10)), 2)
             else:
-                pygame.draw.circle(screen, WHITE, (int(self.x + 12), int(self.y + 10)), eye_size)
-                pygame.draw.circle(screen, BLACK, (int(self.x + 10), int(self.y + 10)), 2)
+                pygame.draw.circle(screen, WHITE, (int(x + 12), int(y + 10)), eye_size)
+                pygame.draw.circle(screen, BLACK, (int(x + 10), int(y + 10)), 2)
+            return body_rect
 
 class Platform:
+    __slots__ = ('x', 'y', 'width', 'height')
+    brick = None  # Whole brick image from the sprite atlas
+    
     def __init__(self, x, y, width, height):
         self.x = x
         self.y = y
         self.width = width
         self.height = height
         
-    def draw(self, screen):
+    def draw(self, screen, camera_y=0):
+        y = self.y - camera_y  # Screen position
         # Draw brick pattern
         brick_width = 32
         brick_height = 16
         
         # Fill background with base red brick color
-        pygame.draw.rect(screen, (139, 35, 35), (self.x, self.y, self.width, self.height))  # Dark red base
+        pygame.draw.rect(screen, (139, 35, 35), (self.x, y, self.width, self.height))  # Dark red base
         
         # Draw individual bricks
         for row in range(0, self.height, brick_height):
@@ -243,34 +529,29 @@ class Platform:
                 # Offset every other row for brick pattern
                 offset = (brick_width // 2) if (row // brick_height) % 2 == 1 else 0
                 brick_x = self.x + col + offset
-                brick_y = self.y + row
+                brick_y = y + row
                 
                 # Only draw brick if it fits within the platform
-                if brick_x < self.x + self.width and brick_y < self.y + self.height:
+                if brick_x < self.x + self.width and brick_y < y + self.height:
                     # Calculate actual brick dimensions (may be clipped)
                     actual_width = min(brick_width, self.x + self.width - brick_x)
-                    actual_height = min(brick_height, self.y + self.height - brick_y)
+                    actual_height = min(brick_height, y + self.height - brick_y)
                     
-                    if actual_width > 0 and actual_height > 0:
-                        # Draw brick with gradient effect
-                        # Red brick color
-                        pygame.draw.rect(screen, (178, 34, 34), (brick_x, brick_y, actual_width, actual_height))
-                        
-                        # Highlight on top and left (3D effect)
-                        pygame.draw.line(screen, (220, 80, 80), (brick_x, brick_y), (brick_x + actual_width - 1, brick_y), 2)
-                        pygame.draw.line(screen, (220, 80, 80), (brick_x, brick_y), (brick_x, brick_y + actual_height - 1), 2)
-                        
-                        # Shadow on bottom and right (3D effect)
-                        pygame.draw.line(screen, (100, 20, 20), (brick_x, brick_y + actual_height - 1), (brick_x + actual_width - 1, brick_y + actual_height - 1), 2)
-                        pygame.draw.line(screen, (100, 20, 20), (brick_x + actual_width - 1, brick_y), (brick_x + actual_width - 1, brick_y + actual_height - 1), 2)
-                        
-                        # Dark outline for each brick
-                        pygame.draw.rect(screen, (80, 15, 15), (brick_x, brick_y, actual_width, actual_height), 1)
+                    if actual_width == brick_width and actual_height == brick_height:
+                        # Whole bricks are copied from the sprite atlas
+                        screen.blit(self.brick, (brick_x, brick_y))
+                    elif actual_width > 0 and actual_height > 0:
+                        # Bricks cut short at the platform's edge are drawn at their cut size
+                        draw_brick(screen, brick_x, brick_y, actual_width, actual_height)
         
         # Draw overall platform border
-        pygame.draw.rect(screen, BLACK, (self.x, self.y, self.width, self.height), 2)
+        pygame.draw.rect(screen, BLACK, (self.x, y, self.width, self.height), 2)
 
 class WinnersCup:
+    __slots__ = ('x', 'y', 'width', 'height', 'collected', 'bob_offset')
+    sprite = None  # Trophy image from the sprite atlas, without the sparkles
+    sprite_offset = (0, 0)  # Where the image's top left is relative to the cup's position
+    
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -288,21 +569,9 @@ class WinnersCup:
             # Draw trophy cup with bobbing animation
             cup_y = self.y + self.bob_offset
             
-            # Cup base (dark gold)
-            pygame.draw.rect(screen, (184, 134, 11), (self.x + 6, cup_y + 24, 12, 8))
-            
-            # Cup stem (gold)
-            pygame.draw.rect(screen, (255, 215, 0), (self.x + 9, cup_y + 18, 6, 6))
-            
-            # Cup bowl (bright gold)
-            pygame.draw.ellipse(screen, (255, 215, 0), (self.x + 2, cup_y + 8, 20, 12))
-            
-            # Cup handles (gold)
-            pygame.draw.arc(screen, (255, 215, 0), (self.x - 2, cup_y + 10, 8, 8), 0, math.pi, 3)
-            pygame.draw.arc(screen, (255, 215, 0), (self.x + 18, cup_y + 10, 8, 8), 0, math.pi, 3)
-            
-            # Cup top rim (bright gold)
-            pygame.draw.ellipse(screen, (255, 223, 0), (self.x + 4, cup_y + 6, 16, 6))
+            # The cup comes from the sprite atlas; its handles stick out left of it
+            offset_x, offset_y = self.sprite_offset
+            screen.blit(self.sprite, (self.x + offset_x, cup_y + offset_y))
             
             # Sparkle effects
             sparkle_time = pygame.time.get_ticks() * 0.01
@@ -312,9 +581,20 @@ class WinnersCup:
                 pygame.draw.circle(screen, (255, 255, 255), (int(sparkle_x), int(sparkle_y)), 2)
 
 class DeadEnemy:
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'start_y', 'width', 'height', 'vel_y', 'gravity', 'rotation',
+                 'rotation_speed', 'max_height', 'landed')
+    sprite = None  # Unrotated enemy image from the sprite atlas
+    rotation_frames = {}  # Angle -> rotated enemy image, shared by all dying enemies
+    
     def __init__(self, x, y):
+        self.reset(x, y)
+        
+    def reset(self, x, y):
+        """(Re)initialise the animation, so a pooled instance can be reused"""
         self.x = x
         self.y = y
+        self.prev_x = x
+        self.prev_y = y
         self.start_y = y
         self.width = 24
         self.height = 24
@@ -339,26 +619,38 @@ class DeadEnemy:
                 return True  # Signal that animation is complete
         return False
         
-    def draw(self, screen):
-        if not self.landed:
-            # Create a surface for the rotating enemy
-            enemy_surf = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
-            pygame.draw.rect(enemy_surf, BLUE, (0, 0, self.width, self.height))
-            # Draw simple face
-            pygame.draw.circle(enemy_surf, WHITE, (8, 8), 3)
-            pygame.draw.circle(enemy_surf, WHITE, (16, 8), 3)
-            pygame.draw.circle(enemy_surf, BLACK, (8, 8), 1)
-            pygame.draw.circle(enemy_surf, BLACK, (16, 8), 1)
-            
+    def get_rotated_frame(self):
+        """Return the enemy image at the current rotation, rendering each angle only once"""
+        # Rotation advances in fixed steps, so only a handful of distinct angles exist
+        angle = self.rotation % 360
+        rotated_surf = self.rotation_frames.get(angle)
+        if rotated_surf is None:
             # Rotate the surface
-            rotated_surf = pygame.transform.rotate(enemy_surf, self.rotation)
+            rotated_surf = pygame.transform.rotate(self.sprite, angle)
+            self.rotation_frames[angle] = rotated_surf
+        return rotated_surf
+        
+    def draw(self, screen, alpha=1.0, camera_y=0):
+        if not self.landed:
+            rotated_surf = self.get_rotated_frame()
             
             # Get the rect and center it on the enemy position
-            rotated_rect = rotated_surf.get_rect(center=(self.x + self.width//2, self.y + self.height//2))
-            screen.blit(rotated_surf, rotated_rect)
+            x = lerp(self.prev_x, self.x, alpha)
+            y = lerp(self.prev_y, self.y, alpha) - camera_y
+            rotated_rect = rotated_surf.get_rect(center=(x + self.width//2, y + self.height//2))
+            return screen.blit(rotated_surf, rotated_rect)
+        return None
 
 class Fruit:
-    def __init__(self, x, y):
+    __slots__ = ('x', 'y', 'width', 'height', 'collected', 'bob_offset', 'bob_speed', 'color')
+    sprites = {}  # Color -> fruit image from the sprite atlas
+    sprite_offset = (0, 0)  # Where the image's top left is relative to the fruit's position
+    
+    def __init__(self, x, y, color=None):
+        self.reset(x, y, color)
+        
+    def reset(self, x, y, color=None):
+        """(Re)initialise the fruit, so a pooled instance can be reused"""
         self.x = x
         self.y = y
         self.width = 16
@@ -366,25 +658,32 @@ class Fruit:
         self.collected = False
         self.bob_offset = 0
         self.bob_speed = 0.1
-        self.color = random.choice([RED, ORANGE, YELLOW, GREEN, PURPLE])  # Random fruit color
+        self.color = color if color is not None else random.choice(FRUIT_COLORS)  # Random fruit color
         
     def update(self):
         # Gentle bobbing animation
         self.bob_offset = math.sin(pygame.time.get_ticks() * self.bob_speed) * 2
         
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0, camera_y=0):
         if not self.collected:
-            fruit_y = self.y + self.bob_offset
+            fruit_y = self.y + self.bob_offset - camera_y
             
-            # Draw fruit as a circle with highlight
-            pygame.draw.circle(screen, self.color, (int(self.x + self.width//2), int(fruit_y + self.height//2)), 8)
-            # Add a small white highlight
-            pygame.draw.circle(screen, WHITE, (int(self.x + self.width//2 - 2), int(fruit_y + self.height//2 - 2)), 2)
+            # Fruit is a circle with a highlight, copied from the sprite atlas
+            offset_x, offset_y = self.sprite_offset
+            return screen.blit(self.sprites[self.color], (self.x + offset_x, fruit_y + offset_y))
+        return None
 
 class Enemy:
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'width', 'height', 'speed', 'direction', 'patrol_start',
+                 'patrol_end', 'animation_frame', 'animation_speed', 'frame_counter', 'total_frames', 'number')
+    frames = None  # [facing left, facing right] -> list of the animation frames, from the sprite atlas
+    
     def __init__(self, x, y, patrol_start, patrol_end):
+        self.number = 0  # Position in the level's enemy list, which identifies the enemy in snapshots
         self.x = x
         self.y = y
+        self.prev_x = x
+        self.prev_y = y
         self.width = 24
         self.height = 24
         self.speed = 1
@@ -399,6 +698,7 @@ class Enemy:
         self.total_frames = 4  # Number of animation frames
         
     def update(self, platforms, rainbows=None):
+        # rainbows is the SpatialHash of rainbows, so only nearby ones get checked
         # Move enemy
         self.x += self.speed * self.direction
         
@@ -415,7 +715,7 @@ class Enemy:
         # Check for collisions with solid rainbow bridges (enemies should turn around, not be pushed)
         if rainbows:
             enemy_rect = pygame.Rect(self.x, self.y, self.width, self.height)
-            for rainbow in rainbows:
+            for rainbow in rainbows.query(enemy_rect):
                 # Only turn around when touching solid, non-dissolving rainbows
                 # Dissolving rainbows should kill the enemy, not affect movement
                 if rainbow.solid and not rainbow.dissolving:
@@ -426,49 +726,289 @@ class Enemy:
                         # Simply turn around when touching a solid rainbow bridge
                         self.direction *= -1
                         break  # Only handle collision with one rainbow at a time
+    
+    def catch_up(self, frames):
+        """Advance a dormant enemy by several frames at once, as if update() had run for each of them
+        
+        Dormant enemies are never near a rainbow, so only the patrol and animation need replaying.
+        This is exact for enemies at whole-pixel positions and speeds, like every stock level's;
+        fractional ones can turn a frame apart from frame-by-frame stepping (see advance_patrol).
+        """
+        ticks, self.frame_counter = divmod(self.frame_counter + frames, self.animation_speed)
+        self.animation_frame = (self.animation_frame + ticks) % self.total_frames
+        self.x, self.direction = advance_patrol(self.x, self.direction, self.speed, self.patrol_start,
+                                                self.patrol_end - self.width, frames)
+        # Appear in place rather than sliding over from where the enemy went to sleep
+        self.prev_x = self.x
+        self.prev_y = self.y
             
-    def draw(self, screen):
-        # Create animated sprite by drawing different patterns based on animation frame
-        base_color = BLUE
-        
-        # Main body with rounded corners
-        pygame.draw.rect(screen, base_color, (self.x, self.y, self.width, self.height), border_radius=6)
-        
-        # Eyes that look in the direction of movement
-        pygame.draw.circle(screen, WHITE, (int(self.x + 6), int(self.y + 8)), 3)
-        pygame.draw.circle(screen, WHITE, (int(self.x + 18), int(self.y + 8)), 3)
-        
-        # Pupils follow movement direction
-        if self.direction > 0:  # Moving right
-            pygame.draw.circle(screen, BLACK, (int(self.x + 7), int(self.y + 8)), 1)  # Right pupil
-            pygame.draw.circle(screen, BLACK, (int(self.x + 19), int(self.y + 8)), 1)  # Right pupil
-        else:  # Moving left
-            pygame.draw.circle(screen, BLACK, (int(self.x + 5), int(self.y + 8)), 1)  # Left pupil
-            pygame.draw.circle(screen, BLACK, (int(self.x + 17), int(self.y + 8)), 1)  # Left pupil
-        
-        # Animated mouth expressions based on current frame
-        if self.animation_frame == 0:
-            # Frame 0: Small curved mouth
-            pygame.draw.arc(screen, BLACK, (self.x + 8, self.y + 14, 8, 6), 0, math.pi, 2)
-            
-        elif self.animation_frame == 1:
-            # Frame 1: Slightly open mouth
-            pygame.draw.ellipse(screen, BLACK, (self.x + 10, self.y + 15, 4, 3))
-            
-        elif self.animation_frame == 2:
-            # Frame 2: Open mouth
-            pygame.draw.ellipse(screen, BLACK, (self.x + 9, self.y + 14, 6, 4))
+    def draw(self, screen, alpha=1.0, camera_y=0):
+        x = lerp(self.prev_x, self.x, alpha)
+        y = lerp(self.prev_y, self.y, alpha) - camera_y
+        # The eyes look the way the enemy is going and the mouth changes with each animation frame
+        return screen.blit(self.frames[self.direction > 0][self.animation_frame], (x, y))
+
+def array_field(name):
+    """Property that reads and writes one EnemyStore array at the view's index"""
+    def get(self):
+        return getattr(self.store, name)[self.index].item()
+    def set(self, value):
+        getattr(self.store, name)[self.index] = value
+    return property(get, set)
+
+class EnemyView(Enemy):
+    """An Enemy whose state lives in an EnemyStore, so it can be drawn and collided like any other"""
+    __slots__ = ('store', 'index')  # The properties below shadow Enemy's slots, which stay unused
+    x = array_field("x")
+    y = array_field("y")
+    prev_x = array_field("prev_x")
+    prev_y = array_field("prev_y")
+    width = array_field("width")
+    height = array_field("height")
+    speed = array_field("speed")
+    direction = array_field("direction")
+    patrol_start = array_field("patrol_start")
+    patrol_end = array_field("patrol_end")
+    animation_frame = array_field("animation_frame")
+    animation_speed = array_field("animation_speed")
+    frame_counter = array_field("frame_counter")
+    total_frames = array_field("total_frames")
+    number = array_field("number")
+    
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+class EnemyStore:
+    """Enemies kept as NumPy arrays so patrols, animation and turning update all at once
+    
+    Iterating the store yields EnemyView objects, so Game can keep colliding enemies one by one;
+    drawing goes straight from the arrays instead. The store also answers the same queries as a
+    SpatialHash, but its enemies are fixed when it is created, so it has no insert().
+    """
+    float_fields = ("x", "y", "prev_x", "prev_y", "width", "height", "speed", "patrol_start", "patrol_end")
+    int_fields = ("direction", "animation_frame", "animation_speed", "frame_counter", "total_frames", "number")
+    
+    def __init__(self, enemies):
+        for name in self.float_fields:
+            setattr(self, name, np.array([getattr(enemy, name) for enemy in enemies], dtype=np.float64))
+        for name in self.int_fields:
+            setattr(self, name, np.array([getattr(enemy, name) for enemy in enemies], dtype=np.int64))
+        self.alive = np.ones(len(enemies), dtype=bool)  # Killed enemies stay in the arrays until compaction
+        self.views = [EnemyView(self, index) for index in range(len(enemies))]
+        self.count = len(enemies)
+        
+    def __len__(self):
+        return self.count
+    
+    def __iter__(self):
+        views = self.views
+        for index in np.flatnonzero(self.alive):
+            yield views[index]
+    
+    def update(self, rainbows, rows=slice(None)):
+        """Run Enemy.update for every enemy at once, or only for a slice of the rows"""
+        # Slices of the arrays are views, so updating them updates the store
+        x = self.x[rows]
+        direction = self.direction[rows]
+        frame_counter = self.frame_counter[rows]
+        animation_frame = self.animation_frame[rows]
+        
+        # Move enemies
+        x += self.speed[rows] * direction
+        
+        # Update animation
+        frame_counter += 1
+        advance = frame_counter >= self.animation_speed[rows]
+        frame_counter[advance] = 0
+        animation_frame[advance] = (animation_frame[advance] + 1) % self.total_frames[rows][advance]
+        
+        # Reverse direction at patrol boundaries
+        width = self.width[rows]
+        turn = (x <= self.patrol_start[rows]) | (x >= self.patrol_end[rows] - width)
+        
+        # Turn around when touching a solid, non-dissolving rainbow bridge (once, however many are touched)
+        touching = np.zeros(len(x), dtype=bool)
+        left = np.trunc(x)  # Match pygame.Rect, which truncates coordinates
+        top = np.trunc(self.y[rows])
+        right = left + np.trunc(width)
+        bottom = top + np.trunc(self.height[rows])
+        for rainbow in rainbows:
+            if rainbow.solid and not rainbow.dissolving:
+                rainbow_rect = pygame.Rect(rainbow.x, rainbow.y - 20, rainbow.bridge_width, rainbow.bridge_height + 20)
+                touching |= ((left < rainbow_rect.right) & (right > rainbow_rect.left) &
+                             (top < rainbow_rect.bottom) & (bottom > rainbow_rect.top))
+        
+        # Two turns in the same frame cancel out, just like the sequential checks in Enemy.update
+        direction[turn ^ touching] *= -1
+    
+    def catch_up(self, rows, frames):
+        """Run Enemy.catch_up for the live enemies in a slice of the rows, all at once"""
+        rows = rows.start + np.flatnonzero(self.alive[rows])
+        if not len(rows):
+            return
+        counter = self.frame_counter[rows] + frames
+        self.animation_frame[rows] = ((self.animation_frame[rows] + counter // self.animation_speed[rows]) %
+                                      self.total_frames[rows])
+        self.frame_counter[rows] = counter % self.animation_speed[rows]
+        
+        # advance_patrol for every row at once: each pass moves the rows still walking to their next turn
+        x = self.x[rows]
+        direction = self.direction[rows]
+        low = self.patrol_start[rows]
+        high = self.patrol_end[rows] - self.width[rows]
+        speed = self.speed[rows]
+        left = np.full(len(rows), frames, dtype=np.int64)
+        
+        # Standing on a patrol boundary turns every frame; anywhere else, nothing happens
+        still = speed == 0
+        direction[still & ((x <= low) | (x >= high)) & (frames % 2 == 1)] *= -1
+        left[still] = 0
+        
+        walking = np.flatnonzero(left > 0)
+        while len(walking):
+            xs = x[walking]
+            step = speed[walking] * direction[walking]
+            lo = low[walking]
+            hi = high[walking]
+            right = step > 0
+            # Frames until a step ends at or past a boundary, corrected for float rounding as in advance_patrol
+            steps = np.maximum(np.ceil((np.where(right, hi, lo) - xs) / step), 1)
+            reached = lambda n: np.where(right, xs + n * step >= hi, xs + n * step <= lo)
+            steps += ~reached(steps)
+            steps -= (steps > 1) & reached(steps - 1)
+            steps[(xs + step <= lo) | (xs + step >= hi)] = 1
             
-        else:  # Frame 3
-            # Frame 3: Closed mouth (line)
-            pygame.draw.line(screen, BLACK, (self.x + 10, self.y + 16), (self.x + 14, self.y + 16), 2)
+            turning = steps <= left[walking]
+            moved = np.where(turning, steps, left[walking])
+            x[walking] = xs + moved * step
+            direction[walking[turning]] *= -1
+            left[walking] -= moved.astype(np.int64)
+            walking = walking[left[walking] > 0]
+        
+        self.x[rows] = x
+        self.direction[rows] = direction
+        # Appear in place rather than sliding over from where the enemies went to sleep
+        self.prev_x[rows] = x
+        self.prev_y[rows] = self.y[rows]
+        
+    def collide_all(self, rects):
+        """For each pygame.Rect, return the live enemies colliding with it, in their original order"""
+        # Match pygame.Rect, which truncates coordinates, and colliderect's strict overlap test
+        left = np.trunc(self.x)
+        top = np.trunc(self.y)
+        right = left + np.trunc(self.width)
+        bottom = top + np.trunc(self.height)
+        bounds = np.array([(rect.left, rect.top, rect.right, rect.bottom) for rect in rects], dtype=np.float64)
+        
+        # One row per rect, one column per enemy
+        hits = (self.alive & (left < bounds[:, 2:3]) & (right > bounds[:, 0:1]) &
+                (top < bounds[:, 3:4]) & (bottom > bounds[:, 1:2]))
+        views = self.views
+        return [[views[index] for index in np.flatnonzero(row)] for row in hits]
+        
+    def overlapping(self, rect):
+        """Mask of the live enemies that may overlap rect"""
+        left, top, width, height = rect[0], rect[1], rect[2], rect[3]
+        return (self.alive & (self.x <= left + width) & (self.x + self.width >= left) &
+                (self.y <= top + height) & (self.y + self.height >= top))
+        
+    def query(self, rect):
+        """Return the live enemies that may overlap rect, in their original order"""
+        views = self.views
+        return [views[index] for index in np.flatnonzero(self.overlapping(rect))]
+    
+    def draw(self, screen, alpha=1.0, camera_y=0, rect=None):
+        """Run Enemy.draw for the live enemies (only those that may overlap rect, if given) in one blits call"""
+        rows = np.flatnonzero(self.alive if rect is None else self.overlapping(rect))
+        x = self.x[rows]
+        y = self.y[rows]
+        if alpha < 1.0:  # As lerp, which is exact when not interpolating
+            prev_x = self.prev_x[rows]
+            prev_y = self.prev_y[rows]
+            x = prev_x + (x - prev_x) * alpha
+            y = prev_y + (y - prev_y) * alpha
+        # Truncate toward zero, as blit does with float coordinates
+        x = x.astype(np.int64).tolist()
+        y = (y - camera_y).astype(np.int64).tolist()
+        
+        # Enemy.frames flattened, so one index picks both the facing and the animation frame
+        frames = Enemy.frames[0] + Enemy.frames[1]
+        sprites = (self.direction[rows] > 0) * len(Enemy.frames[0]) + self.animation_frame[rows]
+        return screen.blits(list(zip(map(frames.__getitem__, sprites.tolist()), zip(x, y))))
+    
+    def move(self, enemy, rect):
+        pass  # Positions already live in the arrays
+    
+    def remove(self, enemy):
+        index = enemy.index
+        if enemy.store is not self or self.views[index] is not enemy or not self.alive[index]:
+            return
+        self.alive[index] = False
+        self.count -= 1
+        
+        # Once most entries are dead, drop them so the vectorised updates stay small
+        if self.count * 2 < len(self.views) and len(self.views) > 64:
+            self.compact()
+    
+    def save_positions(self):
+        """Copy every enemy's position into prev_x/prev_y before a simulation step"""
+        np.copyto(self.prev_x, self.x)
+        np.copyto(self.prev_y, self.y)
+    
+    @staticmethod
+    def snapshot_dtype():
+        # The same bytes as SNAPSHOT_ENEMY, so snapshots don't depend on how enemies are stored
+        return np.dtype([("number", "=u4"), ("x", "=f8"), ("direction", "i1"), ("frame_counter", "i1"),
+                         ("animation_frame", "i1")])
+    
+    def snapshot_records(self, rows=slice(None)):
+        """Pack the living enemies among a slice of rows into SNAPSHOT_ENEMY records"""
+        rows = (rows.start or 0) + np.flatnonzero(self.alive[rows])
+        records = np.empty(len(rows), dtype=self.snapshot_dtype())
+        for name in records.dtype.names:
+            records[name] = getattr(self, name)[rows]
+        return records.tobytes()
+    
+    def snapshot_numbers(self, data):
+        return np.frombuffer(data, dtype=self.snapshot_dtype())["number"].tolist()
+    
+    def restore_records(self, data):
+        """Set the living enemies from SNAPSHOT_ENEMY records, one per living enemy in order"""
+        records = np.frombuffer(data, dtype=self.snapshot_dtype())
+        rows = np.flatnonzero(self.alive)
+        for name in records.dtype.names[1:]:
+            getattr(self, name)[rows] = records[name]
+        
+    def compact(self):
+        keep = self.alive
+        for name in self.float_fields + self.int_fields:
+            setattr(self, name, getattr(self, name)[keep])
+        self.views = [view for view, alive in zip(self.views, keep) if alive]
+        for index, view in enumerate(self.views):
+            view.index = index
+        self.alive = np.ones(len(self.views), dtype=bool)
 
 class Rainbow:
-    def __init__(self, x, y, direction):
+    __slots__ = ('start_x', 'start_y', 'x', 'y', 'prev_x', 'prev_y', 'direction', 'width', 'height', 'speed',
+                 'lifetime', 'solid', 'solid_timer', 'arc_progress', 'max_arc', 'bridge_width', 'bridge_height',
+                 'dissolving', 'dissolve_timer', 'dissolve_fall_speed', 'arc_profile', 'trajectory', 'owner')
+    bridge_sprites = {}  # Bridge width -> pre-rendered bridge, shared by all rainbows
+    arc_profiles = {}  # Bridge width -> hill shape (0 to 1) at each integer x offset
+    trajectories = {}  # (speed, max_arc) -> projectile (x offset, height) at each arc_progress
+    
+    def __init__(self, x, y, direction, owner=0):
+        self.reset(x, y, direction, owner)
+        
+    def reset(self, x, y, direction, owner=0):
+        """(Re)initialise the rainbow, so a pooled instance can be reused"""
+        self.owner = owner  # Index of the player who shot it, who scores the enemies it kills
         self.start_x = x
         self.start_y = y
         self.x = x
         self.y = y
+        self.prev_x = x
+        self.prev_y = y
         self.direction = direction
         self.width = 8
         self.height = 8
@@ -484,6 +1024,43 @@ class Rainbow:
         self.dissolve_timer = 0
         self.dissolve_fall_speed = 2  # Pixels per frame to fall during dissolution
         
+        # Shared lookup tables instead of calling math.sin every frame
+        self.arc_profile = self.get_arc_profile(self.bridge_width)
+        self.trajectory = self.get_trajectory(self.speed, self.max_arc)
+        
+    @classmethod
+    def get_arc_profile(cls, bridge_width):
+        """Return sin() of the bridge's hill shape for every integer offset 0..bridge_width"""
+        profile = cls.arc_profiles.get(bridge_width)
+        if profile is None:
+            profile = cls.arc_profiles[bridge_width] = [
+                math.sin(offset / bridge_width * math.pi) for offset in range(bridge_width + 1)
+            ]
+        return profile
+    
+    @classmethod
+    def get_trajectory(cls, speed, max_arc):
+        """Return the projectile's (x offset, height) for every arc_progress 0..max_arc"""
+        trajectory = cls.trajectories.get((speed, max_arc))
+        if trajectory is None:
+            trajectory = cls.trajectories[(speed, max_arc)] = [
+                (speed * arc_progress, 50 * math.sin(arc_progress / max_arc * math.pi))
+                for arc_progress in range(max_arc + 1)
+            ]
+        return trajectory
+        
+    def surface_y(self, x):
+        """Height of the walkable arc at world position x (which must be on the bridge)"""
+        arc_height = 20
+        return self.y - arc_height * self.arc_profile[int(x - self.x + 0.5)]
+    
+    def get_bounds(self):
+        """Area any collision check against this rainbow can touch"""
+        if self.solid:
+            # The arc rises up to 25 pixels above the bridge's y position
+            return pygame.Rect(self.x - 1, self.y - 26, self.bridge_width + 2, self.bridge_height + 28)
+        return pygame.Rect(self.x - 4, self.y - 4, 8, 8)
+        
     def dissolve(self):
         """Start the dissolution process"""
         if self.solid and not self.dissolving:
@@ -512,531 +1089,1509 @@ class Rainbow:
                 self.height = self.bridge_height
                 # Center the bridge on the final position
                 self.x = self.x - (self.bridge_width // 2)
+                self.prev_x = self.x  # Appear in place rather than sliding over from the projectile
+                self.prev_y = self.y
             self.solid_timer += 1
             if self.solid_timer > 300:  # Rainbow bridge lasts 5 seconds
                 return False
         else:
-            # Calculate arc position
-            progress = self.arc_progress / self.max_arc
-            self.x = self.start_x + (self.direction * self.speed * self.arc_progress)
-            self.y = self.start_y - (50 * math.sin(progress * math.pi))
+            # Look up arc position
+            x_offset, height = self.trajectory[self.arc_progress]
+            self.x = self.start_x + (self.direction * x_offset)
+            self.y = self.start_y - height
             
         self.lifetime -= 1
         return self.lifetime > 0 or self.solid
         
-    def draw(self, screen):
-        if self.solid:
-            # Draw as a solid rainbow bridge in an arc shape
-            alpha = 255
-            if self.dissolving:
-                # Fade out during dissolution over 2 seconds (120 frames)
-                alpha = max(0, 255 - (self.dissolve_timer * 255 // 120))
-            
+    @classmethod
+    def get_bridge_sprite(cls, bridge_width):
+        """Return the arc-shaped bridge image shared by every rainbow of this width"""
+        sprite = cls.bridge_sprites.get(bridge_width)
+        if sprite is None:
             # Draw rainbow as an arc (hill shape)
             arc_height = 25  # Height of the arc at the center
             segments = 20  # Number of segments to create smooth arc
-            segment_width = self.bridge_width // segments
+            segment_width = bridge_width // segments
+            arc_profile = cls.get_arc_profile(bridge_width)
+            
+            # Black never appears in the rainbow, so use it as the transparent colour
+            sprite = pygame.Surface((segments * segment_width + 1, arc_height + len(RAINBOW_COLORS) * 2))
+            sprite.fill(BLACK)
+            sprite.set_colorkey(BLACK)
             
             for segment in range(segments):
                 # Calculate arc position for this segment
-                x_progress = segment / (segments - 1)  # 0 to 1
-                arc_y_offset = arc_height * math.sin(x_progress * math.pi)  # Sine wave for hill shape
+                x_offset = segment * bridge_width / (segments - 1)  # 0 to bridge_width
+                arc_y_offset = arc_height * arc_profile[int(x_offset + 0.5)]  # Sine wave for hill shape
                 
-                segment_x = self.x + (segment * segment_width)
-                segment_y = self.y - arc_y_offset  # Subtract to go upward
+                segment_x = segment * segment_width
+                segment_y = arc_height - arc_y_offset  # Peak of the arc is the top of the sprite
                 
                 # Draw each color stripe of the rainbow for this segment
                 for i, color in enumerate(RAINBOW_COLORS):
                     stripe_y = segment_y + (i * 2)
-                    
-                    # Create a surface for alpha blending if dissolving
-                    if self.dissolving and alpha < 255:
-                        surf = pygame.Surface((segment_width + 1, 2))  # +1 to avoid gaps
-                        surf.set_alpha(alpha)
-                        surf.fill(color)
-                        screen.blit(surf, (segment_x, stripe_y))
-                    else:
-                        pygame.draw.rect(screen, color, (segment_x, stripe_y, segment_width + 1, 2))
+                    pygame.draw.rect(sprite, color, (segment_x, stripe_y, segment_width + 1, 2))
+            
+            cls.bridge_sprites[bridge_width] = sprite
+        return sprite
+        
+    def draw(self, screen, alpha=1.0, camera_y=0):
+        x = lerp(self.prev_x, self.x, alpha)
+        y = lerp(self.prev_y, self.y, alpha) - camera_y
+        if self.solid:
+            # Draw as a solid rainbow bridge in an arc shape
+            fade = 255
+            if self.dissolving:
+                # Fade out during dissolution over 2 seconds (120 frames)
+                fade = max(0, 255 - (self.dissolve_timer * 255 // 120))
+            
+            # The sprite is shared, so set its fade for this blit only
+            sprite = self.get_bridge_sprite(self.bridge_width)
+            sprite.set_alpha(fade)
+            arc_height = 25
+            return screen.blit(sprite, (x, y - arc_height))
         else:
             # Draw as moving rainbow projectile
             color_index = (pygame.time.get_ticks() // 100) % len(RAINBOW_COLORS)
-            pygame.draw.circle(screen, RAINBOW_COLORS[color_index], (int(self.x), int(self.y)), 4)
+            return pygame.draw.circle(screen, RAINBOW_COLORS[color_index], (int(x), int(y)), 4)
 
-class Game:
+class EntityPool:
+    """Free list of reusable entities, so shooting, kills and fruit drops don't allocate new objects"""
+    def __init__(self, entity_class, size=32):
+        self.entity_class = entity_class
+        # Preallocated, uninitialised instances; acquire() fills them in through reset()
+        self.free = [entity_class.__new__(entity_class) for _ in range(size)]
+        
+    def acquire(self, *args):
+        """Return an entity initialised as if by entity_class(*args)"""
+        if self.free:
+            entity = self.free.pop()
+        else:
+            entity = self.entity_class.__new__(self.entity_class)  # Pool grows to the peak in use
+        entity.reset(*args)
+        return entity
+        
+    def release(self, entity):
+        """Hand an entity back for reuse; the caller must drop its own references"""
+        self.free.append(entity)
+        
+    def keep_where(self, entities, keep):
+        """Release the entities for which keep() is false, removing them from the list in place"""
+        # Stable compaction: survivors keep their order, so updates stay deterministic
+        kept = 0
+        for entity in entities:
+            if keep(entity):
+                entities[kept] = entity
+                kept += 1
+            else:
+                self.free.append(entity)
+        del entities[kept:]
+        
+    def release_all(self, entities):
+        """Release every entity in the list and empty it"""
+        self.free.extend(entities)
+        entities.clear()
+
+class TextCache:
+    """Loads each font once and keeps rendered text surfaces for reuse"""
     def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Rainbow Islands - Retro Platform Game")
+        self.fonts = {}  # Font size -> pygame.font.Font
+        self.surfaces = {}  # (text, size, color) -> rendered surface
+        self.labels = {}  # Label name -> ((text, size, color), rendered surface)
+        
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+    
+    def render(self, text, size, color):
+        """Render fixed text, caching the surface for as long as the game runs"""
+        key = (text, size, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.surfaces[key] = self.font(size).render(text, True, color)
+        return surface
+    
+    def render_label(self, name, text, size, color):
+        """Render changing text (like the score), re-rendering only when it changes"""
+        key = (text, size, color)
+        cached = self.labels.get(name)
+        if cached is None or cached[0] != key:
+            cached = self.labels[name] = (key, self.font(size).render(text, True, color))
+        return cached[1]
+
+class SpriteAtlas:
+    """The game's sprites, packed into one image by create_player_sprite.py and loaded once at startup"""
+    def __init__(self, image, index):
+        # Converting to the display's pixel format once makes every blit from the atlas a plain copy
+        self.image = image.convert_alpha()
+        self.rects = {name: entry["rect"] for name, entry in index["sprites"].items()}
+        self.offsets = {name: tuple(entry["offset"]) for name, entry in index["sprites"].items()}
+        
+    @classmethod
+    def load(cls, image_path=ATLAS_IMAGE, index_path=ATLAS_INDEX):
+        """Load the baked atlas, or render the sprites now if it is missing or out of date"""
+        try:
+            with open(index_path) as index_file:
+                index = json.load(index_file)
+            if (index.get("version") == ATLAS_VERSION and
+                    index.get("fruit_colors") == [list(color) for color in FRUIT_COLORS]):
+                return cls(pygame.image.load(image_path), index)
+            print("Sprite atlas is out of date (run create_player_sprite.py), rendering sprites instead")
+        except (pygame.error, OSError, ValueError):
+            print("Sprite atlas not found (run create_player_sprite.py), rendering sprites instead")
+        return cls(*bake_atlas(FRUIT_COLORS))
+    
+    def sprite(self, name):
+        """The named sprite, as a subsurface that shares the atlas's pixels"""
+        return self.image.subsurface(self.rects[name])
+
+# Phases of a frame timed by FrameProfiler, in the order they run
+FRAME_PHASES = [
+    "events", "save_positions",
+    "player", "collide_projectiles", "rainbows", "collide_falling_before", "enemies",
+    "collide_chain", "collide_falling_after", "collide_player_enemies",
+    "dead_enemies", "fruits", "collide_fruit", "snapshot",
+    "draw_background", "draw_enemies", "draw_dead_enemies", "draw_fruits", "draw_rainbows",
+    "draw_player", "draw_hud", "draw_overlay", "draw_profiler",
+    "present", "tick",
+]
+
+class FrameProfiler:
+    """Times each phase of every frame for the on-screen overlay and CSV export"""
+    def __init__(self, csv_path=None, window=600):
+        self.enabled = csv_path is not None
+        self.window = window  # Frames kept for the rolling averages and p99 (10 seconds)
+        self.history = {phase: deque(maxlen=window) for phase in FRAME_PHASES + ["frame", "input_latency"]}
+        self.times = dict.fromkeys(FRAME_PHASES, 0.0)  # Milliseconds spent in each phase this frame
+        self.latency = None  # Input-to-display milliseconds of a key press this frame showed, if any
+        self.frame_number = 0
+        self.last_time = 0.0
+        
+        self.csv_file = None
+        if csv_path:
+            self.csv_file = open(csv_path, "w", newline="")
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(["frame"] + FRAME_PHASES + ["frame_ms", "input_latency_ms"])
+            
+    def set_enabled(self, enabled):
+        """Turn timing on or off; turning it on mid-frame times the rest of that frame from now"""
+        if enabled and not self.enabled:
+            # begin_frame() skipped its reset while timing was off, so the times and clock are stale
+            self.times = dict.fromkeys(FRAME_PHASES, 0.0)
+            self.last_time = time.perf_counter()
+        self.enabled = enabled
+        
+    def begin_frame(self):
+        if self.enabled:
+            self.times = dict.fromkeys(FRAME_PHASES, 0.0)
+            self.last_time = time.perf_counter()
+    
+    def lap(self, phase):
+        """Charge the time since the previous lap to the given phase"""
+        if self.enabled:
+            now = time.perf_counter()
+            self.times[phase] += (now - self.last_time) * 1000
+            self.last_time = now
+    
+    def record_latency(self, ms):
+        """Note that this frame is the first to show the effect of a key press, collected ms ago"""
+        if self.enabled:
+            self.latency = ms
+    
+    def end_frame(self):
+        if not self.enabled:
+            return
+        # Time spent waiting in clock.tick is idle, not part of the frame's work
+        frame_ms = sum(self.times.values()) - self.times["tick"]
+        for phase, ms in self.times.items():
+            self.history[phase].append(ms)
+        self.history["frame"].append(frame_ms)
+        # Only frames that showed a key press have a latency; the rolling stats cover the last presses
+        latency = self.latency
+        if latency is not None:
+            self.history["input_latency"].append(latency)
+            self.latency = None
+        
+        if self.csv_file:
+            self.csv_writer.writerow([self.frame_number] + [f"{self.times[phase]:.4f}" for phase in FRAME_PHASES]
+                                     + [f"{frame_ms:.4f}", "" if latency is None else f"{latency:.4f}"])
+        self.frame_number += 1
+    
+    def stats(self):
+        """Return (phase, average ms, p99 ms) for every phase that took measurable time"""
+        stats = []
+        for phase, samples in self.history.items():
+            if samples:
+                average = sum(samples) / len(samples)
+                if average >= 0.005 or phase == "frame":
+                    ordered = sorted(samples)
+                    stats.append((phase, average, ordered[int(0.99 * (len(ordered) - 1))]))
+        return stats
+    
+    def close(self):
+        if self.csv_file:
+            self.csv_file.close()
+            self.csv_file = None
+
+class InputLog:
+    """A recorded session: the RNG seed, the Input bitmask of every frame and the state checksum after it
+    
+    File layout (little-endian): b"RIRP", format version (u8), seed (u32), frame count (u32),
+    one input byte per frame, then one CRC32 (u32) per frame.
+    """
+    MAGIC = b"RIRP"
+    VERSION = 1
+    HEADER = "<4sBII"
+    
+    def __init__(self, seed, inputs=None, checksums=None):
+        # Checked now rather than when save() packs it, so a bad seed can't lose a whole session
+        if not 0 <= seed < 2 ** 32:
+            raise ValueError(f"Input logs store the seed as 32 bits unsigned; {seed} is out of range")
+        self.seed = seed
+        self.inputs = inputs if inputs is not None else bytearray()
+        self.checksums = checksums if checksums is not None else array("I")
+        
+    def __len__(self):
+        return len(self.inputs)
+    
+    def record(self, inputs, checksum):
+        self.inputs.append(inputs)
+        self.checksums.append(checksum)
+        
+    def save(self, path):
+        checksums = array("I", self.checksums)
+        if sys.byteorder == "big":
+            checksums.byteswap()
+        with open(path, "wb") as log_file:
+            log_file.write(struct.pack(self.HEADER, self.MAGIC, self.VERSION, self.seed, len(self.inputs)))
+            log_file.write(self.inputs)
+            log_file.write(checksums.tobytes())
+            
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as log_file:
+            data = log_file.read()
+        header_size = struct.calcsize(cls.HEADER)
+        magic, version, seed, frames = struct.unpack_from(cls.HEADER, data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"{path} is not a version {cls.VERSION} input log")
+        inputs = bytearray(data[header_size:header_size + frames])
+        checksums = array("I")
+        checksums.frombytes(data[header_size + frames:header_size + frames * 5])
+        if sys.byteorder == "big":
+            checksums.byteswap()
+        if len(inputs) != frames or len(checksums) != frames:
+            raise ValueError(f"{path} is truncated")
+        return cls(seed, inputs, checksums)
+
+# Game.snapshot() layout (native byte order; snapshots live in memory, never on disk): game state,
+# level, simulation frame, fruit colours drawn, whether the awake chunk range is known and
+# the range itself, then how many players, enemies, rainbows, dying enemies, fruit and dormant
+# chunks follow. The players come next as doubles, then one SNAPSHOT_ENEMY record per enemy still
+# alive, then each rainbow, dying enemy, fruit and dormant chunk in turn as SNAPSHOT_FIELDS doubles apiece.
+SNAPSHOT_HEADER = struct.Struct("=BHIIBiiBIHHHH")
+SNAPSHOT_ENEMY = struct.Struct("=Idbbb")  # number, x, direction, frame_counter, animation_frame
+SNAPSHOT_FIELDS = {
+    "player": 11,  # x, y, vel_x, vel_y, on_ground, facing_right, rainbow_cooldown, jump_buffer, coyote_frames,
+                   # score, caught
+    "rainbow": 12,  # start_x, start_y, direction, x, y, lifetime, solid, solid_timer, arc_progress, dissolving,
+                    # dissolve_timer, owner
+    "dead_enemy": 6,  # x, y, start_y, vel_y, rotation, landed
+    "fruit": 3,  # x, y, index in FRUIT_COLORS
+    "dormant": 2,  # chunk, first frame it missed
+}
+REWIND_MEMORY_LIMIT = 32 * 1024 * 1024  # Bytes of snapshots kept for rewinding, whatever the level's size
+
+class Game:
+    def __init__(self, dirty_rects=False, headless=False, profile_csv=None, array_enemies=False, render_fps=FPS,
+                 seed=None, record_path=None, levels_dir=LEVELS_DIR, rewind_seconds=10, players=1):
+        # Headless games never open a window or draw; they are driven through step()
+        self.headless = headless
+        self.verbose = not headless  # Per-event debug messages would swamp fast simulations
+        if headless:
+            self.screen = None
+        else:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("Rainbow Islands - Retro Platform Game")
+            self.load_sprites()
         self.clock = pygame.time.Clock()
+        
+        # The simulation always steps at FPS; drawing runs at its own rate (0 = as fast as possible)
+        # and interpolates between the last two steps
+        self.render_fps = render_fps
+        
+        # Keep enemies in NumPy arrays and update them all at once (for levels with thousands)
+        if array_enemies and np is None:
+            raise RuntimeError("array_enemies needs NumPy: pip install numpy")
+        self.array_enemies = array_enemies
+        
+        # Dirty-rect rendering: only repaint and push the regions that changed
+        self.dirty_rects = dirty_rects
+        self.previous_rects = []  # Screen areas drawn over during the last frame
+        self.drawn_background = None  # Background the screen currently shows
+        self.camera_y = 0  # World y at the top of the screen
+        self.drawn_camera_y = 0  # Camera position the screen currently shows
+        self.drawn_state = None  # Game state the screen currently shows (overlays only go with a repaint)
+        
+        # Fonts and rendered text are reused across frames instead of rebuilt
+        self.text_cache = TextCache()
+        self.overlay_key = None  # (state, level, scores) the current overlay shows
+        self.overlay_blits = []
+        
+        # Per-phase frame timing, shown with F3 and/or written to a CSV file
+        self.profiler = FrameProfiler(profile_csv)
+        self.show_profiler = False
+        self.profiler_surface = None
+        self.profiler_refresh_frame = 0  # Profiler frame number when the overlay is next redrawn
+        
+        # Everything random in the simulation comes from this generator, so a session
+        # replays exactly from its seed and inputs
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.fruit_colors_drawn = 0  # Random draws so far, which is all a snapshot needs to restore the generator
+        self.keyboard = KeyboardInput()  # This frame's keys, collected once per frame for the steps to take
+        self.sim_frame = 0  # Simulation steps played, for catching up dormant enemies
+        self.record_path = record_path
+        if record_path and players > 1:
+            raise ValueError("Input logs hold one player's inputs; only one-player games can be recorded")
+        self.recording = InputLog(self.seed) if record_path else None
+        
+        # Players play head to head on the same level: each scores for themselves and is out once
+        # caught, and the game is over when everyone is; the camera follows one of them
+        self.player_count = players
+        self.camera_player = 0
+        
+        # A snapshot of every frame, most recent last, for holding REWIND to step back through
+        # (0 seconds turns rewinding off). Levels with thousands of enemies keep fewer seconds,
+        # so the buffer never holds more than REWIND_MEMORY_LIMIT bytes
+        self.rewind_frames = rewind_seconds * FPS
+        self.rewind_buffer = deque() if rewind_seconds else None
+        self.rewind_bytes = 0
+        
+        # Level files listed in the levels directory's index.json
+        self.levels = LevelLibrary(levels_dir)
+        
+        # Short-lived entities are recycled through pools instead of being reallocated
+        self.rainbow_pool = EntityPool(Rainbow)
+        self.dead_enemy_pool = EntityPool(DeadEnemy)
+        self.fruit_pool = EntityPool(Fruit)
+        self.rainbows = []
+        self.dead_enemies = []  # For death animations
+        self.fruits = []  # For collectible fruits
+        
+        self.reset()
+        
+    def load_sprites(self):
+        """Hand the sprite atlas's images to the classes that draw them (once; later games reuse them)"""
+        if Enemy.frames is not None:
+            return
+        atlas = SpriteAtlas.load()
+        Enemy.frames = [[atlas.sprite(f"enemy_{side}_{frame}") for frame in range(4)] for side in ("left", "right")]
+        DeadEnemy.sprite = atlas.sprite("dead_enemy")
+        Fruit.sprites = {color: atlas.sprite(f"fruit_{index}") for index, color in enumerate(FRUIT_COLORS)}
+        Fruit.sprite_offset = atlas.offsets["fruit_0"]
+        WinnersCup.sprite = atlas.sprite("trophy")
+        WinnersCup.sprite_offset = atlas.offsets["trophy"]
+        Platform.brick = atlas.sprite("brick")
+        
+    def reset(self, level=1):
+        """Start a new game from the given level"""
         self.state = GameState.PLAYING
         
         # Initialize game state
-        self.score = 0
-        self.level = 1
+        self.scores = [0] * self.player_count
+        self.caught = [False] * self.player_count  # Players caught are out for the rest of the game
+        self.level = level
         
         # Initialize game objects
-        self.player = Player(100, 500)
         self.platforms = self.create_level()
+        self.create_players()
         self.enemies = self.create_enemies()
         # self.trophy = self.create_trophy()
-        self.rainbows = []
-        self.dead_enemies = []  # For death animations
-        self.fruits = []  # For collectible fruits
+        self.clear_entities()
+        if self.rewind_buffer is not None:
+            # No rewinding into the previous game, but back to the very start of this one
+            self.rewind_buffer.clear()
+            self.rewind_bytes = 0
+            self.save_rewind_frame()
+        
+    @property
+    def score(self):
+        """Points scored by all players together, which is the score of a one-player game"""
+        return sum(self.scores)
+    
+    def winner(self):
+        """Index of the player with the most points, or None on a draw"""
+        best = max(self.scores)
+        if self.scores.count(best) > 1:
+            return None
+        return self.scores.index(best)
+    
+    def catch_player(self, index):
+        """Put a player out of the game, which is over once nobody is left"""
+        self.caught[index] = True
+        if all(self.caught):
+            self.state = GameState.GAME_OVER
+        
+    def clear_entities(self):
+        """Return all rainbows, dying enemies and fruit to their pools"""
+        self.rainbow_pool.release_all(self.rainbows)
+        self.dead_enemy_pool.release_all(self.dead_enemies)
+        self.fruit_pool.release_all(self.fruits)
+        
+        # Spatial hashes used to find collision candidates
+        self.rainbow_grid = SpatialHash()
+        self.fruit_grid = SpatialHash()
         
     def advance_to_next_level(self):
         """Advance to the next level, resetting game state but keeping score"""
         self.level += 1
         
-        # Reset player position
-        self.player = Player(100, 500)
-        
         # Create new level layout
         self.platforms = self.create_level()
         self.enemies = self.create_enemies()
         
+        # Reset player position
+        self.create_players()
+        
         # Clear game objects
-        self.rainbows = []
-        self.dead_enemies = []
-        self.fruits = []
+        self.clear_entities()
         
         # Return to playing state
         self.state = GameState.PLAYING
         
-        print(f"Advanced to Level {self.level}!")
+        self.log(f"Advanced to Level {self.level}!")
+
+    def create_players(self):
+        """Put every player at the level's start, side by side"""
+        x, y = self.level_data.player_start
+        self.players = [Player(x + index * PLAYER_SPACING, y, PLAYER_COLORS[index % len(PLAYER_COLORS)])
+                        for index in range(self.player_count)]
+        self.player = self.players[0]
 
     def create_level(self):
-        if self.level == 1:
-            return self.create_level_1()
-        elif self.level == 2:
-            return self.create_level_2()
-        else:
-            # Default to level 1 if unknown level
-            return self.create_level_1()
-    
-    def create_level_1(self):
-        platforms = []
-        
-        # Ground level platforms (shorter, scattered)
-        platforms.extend([
-            Platform(0, 580, 180, 20),      # Left edge
-            Platform(320, 580, 160, 20),    # Center
-            Platform(620, 580, 180, 20),    # Right edge (extends to screen edge)
-        ])
-        
-        # Mid platforms (medium length, some from edges) - increased gap from 450 to 380
-        platforms.extend([
-            Platform(0, 380, 220, 20),      # From left edge
-            Platform(400, 330, 140, 20),    # Center short
-            Platform(580, 280, 220, 20),    # From right edge (extends to screen edge)
-            Platform(80, 250, 160, 20),     # Left side
-        ])
-        
-        # Top platform (moved down, removed the two beneath it)
-        platforms.extend([
-            Platform(0, 120, 800, 20),      # Full screen width platform (moved down from Y=40)
-        ])
+        # Level layouts come from the level files, loaded the first time each is played
+        self.level_data = self.levels.get(self.level)
+        platforms = [Platform(x, y, width, height) for x, y, width, height in self.level_data.platform_rects()]
+        self.world_height = self.level_data.height
+        self.last_chunk = (self.world_height - 1) // CHUNK_HEIGHT
+        
+        # Platforms never move, so they are baked into the background, one chunk at a time
+        # the first time the camera reaches it
+        self.background_chunks = {}  # Chunk index -> baked background, least recently used first
         
+        # Index platforms for collisions once per level
+        self.platform_grid = SpatialHash()
+        for platform in platforms:
+            self.platform_grid.insert(platform, (platform.x, platform.y, platform.width, platform.height))
         return platforms
     
-    def create_level_2(self):
-        platforms = []
-        
-        # Level 2: More challenging vertical layout with smaller platforms
-        # Ground level - more scattered and smaller
-        platforms.extend([
-            Platform(0, 580, 120, 20),      # Left edge (smaller)
-            Platform(200, 560, 100, 20),    # Offset platform
-            Platform(380, 580, 120, 20),    # Center (smaller)
-            Platform(580, 560, 100, 20),    # Offset platform
-            Platform(700, 580, 100, 20),    # Right edge (smaller)
-        ])
-        
-        # Lower mid platforms - staggered heights
-        platforms.extend([
-            Platform(50, 480, 140, 20),     # Left low
-            Platform(300, 450, 100, 20),    # Center low
-            Platform(500, 480, 140, 20),    # Right low
-        ])
-        
-        # Upper mid platforms - more challenging jumps
-        platforms.extend([
-            Platform(0, 350, 160, 20),      # Left edge
-            Platform(240, 320, 120, 20),    # Center left
-            Platform(440, 350, 120, 20),    # Center right
-            Platform(640, 320, 160, 20),    # Right edge
-        ])
-        
-        # High platforms - requires rainbow bridges
-        platforms.extend([
-            Platform(100, 200, 140, 20),    # Left high
-            Platform(350, 180, 100, 20),    # Center high (small)
-            Platform(560, 200, 140, 20),    # Right high
-        ])
-        
-        # Top platforms - final challenge
-        platforms.extend([
-            Platform(0, 80, 200, 20),       # Left top
-            Platform(300, 60, 200, 20),     # Center top
-            Platform(600, 80, 200, 20),     # Right top
-        ])
+    def background_chunk(self, chunk):
+        """Return the baked background of one chunk, rendering it when it first comes into view"""
+        background = self.background_chunks.pop(chunk, None)
+        if background is None:
+            background = self.render_background_chunk(chunk)
+        self.background_chunks[chunk] = background
+        if len(self.background_chunks) > BACKGROUND_CHUNKS_KEPT:
+            del self.background_chunks[next(iter(self.background_chunks))]
+        return background
+    
+    def render_background_chunk(self, chunk):
+        """Render the sky, instructions and platforms of one chunk into an off-screen surface"""
+        top = chunk * CHUNK_HEIGHT
+        background = pygame.Surface((SCREEN_WIDTH, CHUNK_HEIGHT)).convert()
+        background.fill(SKY_BLUE)
         
-        return platforms
+        # Draw instructions FIRST (behind everything else)
+        instructions = [
+            "Arrow Keys / WASD: Move and Jump",
+            "X / Left Ctrl: Shoot Rainbow",
+            "Defeat enemies to create fruit (20 points each)!",
+            "Create rainbow bridges to reach higher platforms!"
+        ]
+        for i, instruction in enumerate(instructions):
+            # Near the bottom of the level, where the player starts
+            text = self.text_cache.render(instruction, 24, GREY)
+            background.blit(text, (400, self.world_height - 200 + i * 25 - top))
         
-    def create_enemies(self):
-        if self.level == 1:
-            return self.create_enemies_1()
-        elif self.level == 2:
-            return self.create_enemies_2()
-        else:
-            # Default to level 1 if unknown level
-            return self.create_enemies_1()
+        # Draw platforms
+        for platform in self.platform_grid.query((0, top, SCREEN_WIDTH, CHUNK_HEIGHT)):
+            platform.draw(background, top)
+        
+        return background
     
-    def create_enemies_1(self):
-        enemies = [
-            # Ground level enemies (removed enemy from spawn platform and center platform)
-            Enemy(650, 556, 620, 800),      # On right ground platform only
-            
-            # Mid-level enemies (removed enemy from shortest center platform)
-            Enemy(100, 356, 0, 220),        # On left-edge platform (Y=380-20-4=356)
-            Enemy(650, 256, 580, 800),      # On right-edge platform (Y=280-20-4=256)
-            Enemy(120, 226, 80, 240),       # On left-side platform (Y=250-20-4=226)
-            
-            # Top level enemies (kept all - these are on longer platforms)
-            Enemy(200, 96, 0, 350),         # On very long left platform (Y=120-20-4=96)
-            Enemy(600, 96, 450, 800),       # On very long right platform (Y=100-20-4=76)
-        ]
-        return enemies
+    def blit_background(self, area):
+        """Copy the background under a screen area onto the screen, from whichever chunks it spans"""
+        top = area.top + self.camera_y
+        first = max(top // CHUNK_HEIGHT, 0)
+        last = min((top + area.height - 1) // CHUNK_HEIGHT, self.last_chunk)
+        for chunk in range(first, last + 1):
+            chunk_y = chunk * CHUNK_HEIGHT - self.camera_y  # Where the chunk's top is on screen
+            source = area.move(0, -chunk_y).clip((0, 0, SCREEN_WIDTH, CHUNK_HEIGHT))
+            if source:
+                self.screen.blit(self.background_chunk(chunk), (source.x, source.y + chunk_y), source)
     
-    def create_enemies_2(self):
-        enemies = [
-            # Ground level enemies - more spread out on smaller platforms
-            # Enemy removed from left ground platform (spawn area)
-            Enemy(420, 556, 380, 500),      # Center ground platform
-            Enemy(750, 556, 700, 800),      # Right ground platform
-            
-            # Lower mid enemies
-            Enemy(120, 456, 50, 190),       # Left low platform
-            Enemy(350, 426, 300, 400),      # Center low platform (small)
-            Enemy(570, 456, 500, 640),      # Right low platform
-            
-            # Upper mid enemies - more challenging
-            Enemy(80, 326, 0, 160),         # Left edge platform
-            Enemy(300, 296, 240, 360),      # Center left platform
-            Enemy(500, 326, 440, 560),      # Center right platform
-            Enemy(720, 296, 640, 800),      # Right edge platform
-            
-            # High platform enemies - requires strategy
-            Enemy(170, 176, 100, 240),      # Left high platform
-            Enemy(400, 156, 350, 450),      # Center high platform (very small!)
-            Enemy(630, 176, 560, 700),      # Right high platform
-            
-            # Top level enemies - final challenge
-            Enemy(100, 56, 0, 200),         # Left top platform
-            Enemy(400, 36, 300, 500),       # Center top platform
-            Enemy(700, 56, 600, 800),       # Right top platform
-        ]
+    def create_enemies(self):
+        enemies = [Enemy(x, y, patrol_start, patrol_end)
+                   for x, y, patrol_start, patrol_end in self.level_data.enemy_patrols()]
+        
+        # Enemies only patrol sideways, so each stays in the chunk it starts in. Keeping them in
+        # chunk order puts each chunk's enemies next to each other in the enemy store
+        enemies.sort(key=lambda enemy: int(enemy.y) // CHUNK_HEIGHT)
+        for number, enemy in enumerate(enemies):
+            enemy.number = number
+        self.enemy_chunks = {}
+        for enemy in enemies:
+            self.enemy_chunks.setdefault(int(enemy.y) // CHUNK_HEIGHT, []).append(enemy)
+        self.awake_chunks = None  # Worked out on the first update
+        self.dormant_since = {}  # Dormant chunk -> first frame it missed, oldest first
+        self.dormant_records = {}  # Dormant chunk -> (its dormant_since, its enemies' snapshot records)
+        self.all_chunks_awake = True
+        self.active_rows = None  # Slice of the enemy store's rows in awake chunks
+        self.store_chunks = None  # Chunk of each of the enemy store's rows
+        
+        if self.array_enemies:
+            # The store holds every enemy's state and also serves as the enemy index
+            self.enemy_store = EnemyStore(enemies)
+            self.enemy_grid = self.enemy_store
+            self.active_enemies = self.enemy_store
+            return self.enemy_store
+        
+        # Enemies are inserted once and then moved as they patrol
+        self.enemy_store = None
+        self.enemy_grid = SpatialHash()
+        for enemy in enemies:
+            self.enemy_grid.insert(enemy, (enemy.x, enemy.y, enemy.width, enemy.height))
+        self.active_enemies = enemies
         return enemies
+    
+    def schedule_chunks(self):
+        """Sort the chunks into tiers: awake near the player or a rainbow, dormant everywhere else
         
+        Awake chunks' enemies update every frame. Dormant ones skip their updates and are caught
+        up in one go when they wake, plus now and then while asleep, so their patrols carry on
+        exactly as if they had never stopped.
+        """
+        first = min(int(player.y) for player in self.players) // CHUNK_HEIGHT - ACTIVE_CHUNKS
+        last = max(int(player.y) for player in self.players) // CHUNK_HEIGHT + ACTIVE_CHUNKS
+        for rainbow in self.rainbows:
+            # Falling rainbows kill enemies and standing ones turn them, so the enemies near any rainbow stay awake
+            first = min(first, (int(rainbow.y) - RAINBOW_WAKE_DISTANCE) // CHUNK_HEIGHT)
+            last = max(last, (int(rainbow.y) + RAINBOW_WAKE_DISTANCE) // CHUNK_HEIGHT)
+        awake = (first, last)  # Chunks in between are awake too, so the awake enemies are one run of rows
+        
+        if awake != self.awake_chunks:
+            for chunk in self.enemy_chunks:
+                if first <= chunk <= last:
+                    since = self.dormant_since.pop(chunk, None)
+                    if since is not None:
+                        self.catch_up_chunk(chunk, self.sim_frame - since)
+                elif chunk not in self.dormant_since:
+                    self.dormant_since[chunk] = self.sim_frame
+            self.awake_chunks = awake
+            self.all_chunks_awake = not self.dormant_since
+            self.active_rows = None
+            self.collect_active_enemies()
+        
+        # Refresh the longest-dormant chunk, so none falls far behind and waking never has much to do
+        if self.dormant_since:
+            chunk, since = next(iter(self.dormant_since.items()))
+            if self.sim_frame - since >= DORMANT_REFRESH_FRAMES:
+                del self.dormant_since[chunk]
+                self.catch_up_chunk(chunk, self.sim_frame - since)
+                self.dormant_since[chunk] = self.sim_frame
+    
+    def catch_up_chunk(self, chunk, frames):
+        """Replay the frames a dormant chunk's enemies missed"""
+        if frames <= 0:
+            return
+        if self.enemy_store is not None:
+            self.enemy_store.catch_up(self.store_rows(chunk, chunk), frames)
+        else:
+            for enemy in self.enemy_chunks[chunk]:
+                enemy.catch_up(frames)
+                self.enemy_grid.move(enemy, (enemy.x, enemy.y, enemy.width, enemy.height))
+    
+    def collect_active_enemies(self):
+        """List the enemies in awake chunks, in chunk order"""
+        if self.enemy_store is not None:
+            return  # The store picks its awake rows each update
+        if self.all_chunks_awake:
+            self.active_enemies = self.enemies
+        else:
+            first, last = self.awake_chunks
+            self.active_enemies = [enemy for chunk in range(first, last + 1)
+                                   for enemy in self.enemy_chunks.get(chunk, ())]
+    
+    def store_rows(self, first, last):
+        """Slice of the enemy store's rows holding chunks first to last"""
+        chunks = self.store_chunks
+        if chunks is None or len(chunks) != len(self.enemy_store.y):  # New store, or compacted since
+            chunks = self.store_chunks = self.enemy_store.y // CHUNK_HEIGHT  # Ascending: the store is in chunk order
+        return slice(int(np.searchsorted(chunks, first, "left")), int(np.searchsorted(chunks, last, "right")))
+    
+    def active_enemy_rows(self):
+        """Slice of the enemy store's rows in awake chunks"""
+        if self.all_chunks_awake:
+            return slice(None)
+        # Compaction renumbers the rows, so look the slice up again after one
+        if self.active_rows is None or self.active_rows_length != len(self.enemy_store.y):
+            self.active_rows = self.store_rows(*self.awake_chunks)
+            self.active_rows_length = len(self.enemy_store.y)
+        return self.active_rows
+    
     def create_trophy(self):
-        trophy = WinnersCup(650, 20)
+        if self.level_data.trophy is None:
+            return None
+        trophy = WinnersCup(*self.level_data.trophy)
         #trophy.draw()
         return trophy
 
     def handle_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_x or event.key == pygame.K_LCTRL:
-                    # Shoot rainbow
-                    rainbow = self.player.shoot_rainbow()
-                    if rainbow:
-                        self.rainbows.append(rainbow)
-                elif event.key == pygame.K_r and (self.state == GameState.GAME_OVER or self.state == GameState.WIN):
-                    # Restart game
-                    self.__init__()
-                elif event.key == pygame.K_SPACE and self.state == GameState.LEVEL_COMPLETE:
-                    # Advance to next level or win
-                    if self.level < 2:
-                        self.advance_to_next_level()
-                    else:
-                        self.state = GameState.WIN
-                    
-        return True
+        """Collect this frame's input; returns False once the window is closed"""
+        keyboard = self.keyboard
+        keyboard.collect()
+        if pygame.K_F3 in keyboard.other_presses:
+            # Toggle the frame timing overlay (timing stays on while exporting to CSV)
+            self.show_profiler = not self.show_profiler
+            self.profiler.set_enabled(self.show_profiler or self.profiler.csv_file is not None)
+            self.profiler_refresh_frame = 0
+        return not keyboard.quit
         
-    def update(self):
+    def step(self, inputs):
+        """Advance the game by one frame using the given Input flags, without drawing or waiting
+        
+        Games with several players take a tuple of Inputs, one per player.
+        """
+        player_inputs = per_player(inputs, self.player_count)
+        if any(inputs & Input.REWIND for inputs in player_inputs) and self.rewind_buffer is not None:
+            self.rewind()
+        else:
+            self.advance(player_inputs)
+        if self.recording is not None:
+            self.recording.record(inputs, self.checksum())
+        return self.state
+    
+    def advance(self, player_inputs):
+        """Play one frame forwards, given a tuple of every player's Inputs"""
+        inputs = Input.NONE
+        for flags in player_inputs:
+            inputs |= flags  # Any player can restart or move on
+        if inputs & Input.RESTART and (self.state == GameState.GAME_OVER or self.state == GameState.WIN):
+            # Restart game
+            self.reset()
+        elif inputs & Input.NEXT_LEVEL and self.state == GameState.LEVEL_COMPLETE:
+            # Advance to next level or win
+            if self.level < len(self.levels):
+                self.advance_to_next_level()
+            else:
+                self.state = GameState.WIN
+        for index, (player, flags) in enumerate(zip(self.players, player_inputs)):
+            # Players who are out can't shoot while the others play on
+            if flags & Input.SHOOT and not (self.caught[index] and self.state == GameState.PLAYING):
+                # Shoot rainbow
+                rainbow = player.shoot_rainbow(self.rainbow_pool)
+                if rainbow:
+                    rainbow.owner = index
+                    self.rainbows.append(rainbow)
+        self.update(player_inputs)
+        if self.rewind_buffer is not None:
+            self.save_rewind_frame()
+            self.profiler.lap("snapshot")
+    
+    def save_rewind_frame(self):
+        """Add this frame's snapshot to the rewind buffer, forgetting the oldest ones beyond its limits"""
+        snapshot = self.snapshot()
+        buffer = self.rewind_buffer
+        buffer.append(snapshot)
+        self.rewind_bytes += len(snapshot)
+        while len(buffer) > 1 and (len(buffer) > self.rewind_frames or self.rewind_bytes > REWIND_MEMORY_LIMIT):
+            self.rewind_bytes -= len(buffer.popleft())
+    
+    def rewind(self):
+        """Step back one frame through the rewind buffer"""
+        # The newest snapshot is the current frame; the one before it is the frame to go back to
+        buffer = self.rewind_buffer
+        if len(buffer) > 1:
+            self.rewind_bytes -= len(buffer.pop())
+            self.restore(buffer[-1])
+        self.profiler.lap("snapshot")
+    
+    def next_fruit_color(self):
+        """Pick a fruit's colour, counting the draws so snapshots can put the generator back"""
+        self.fruit_colors_drawn += 1
+        return self.rng.choice(FRUIT_COLORS)
+    
+    def seek_fruit_colors(self, drawn):
+        """Put the random generator back to how it was after the given number of fruit colour draws"""
+        if drawn < self.fruit_colors_drawn:
+            self.rng = random.Random(self.seed)
+            self.fruit_colors_drawn = 0
+        while self.fruit_colors_drawn < drawn:
+            self.next_fruit_color()
+    
+    def snapshot(self):
+        """Pack the whole simulation state into bytes that restore() can return to"""
+        values = array("d", [value for player, score, caught in zip(self.players, self.scores, self.caught)
+                             for value in (player.x, player.y, player.vel_x, player.vel_y, player.on_ground,
+                                           player.facing_right, player.rainbow_cooldown, player.jump_buffer,
+                                           player.coyote_frames, score, caught)])
+        enemy_bytes = self.snapshot_enemies()
+        
+        others = array("d", [value for rainbow in self.rainbows
+                             for value in (rainbow.start_x, rainbow.start_y, rainbow.direction, rainbow.x, rainbow.y,
+                                           rainbow.lifetime, rainbow.solid, rainbow.solid_timer, rainbow.arc_progress,
+                                           rainbow.dissolving, rainbow.dissolve_timer, rainbow.owner)])
+        others.extend([value for dead_enemy in self.dead_enemies
+                       for value in (dead_enemy.x, dead_enemy.y, dead_enemy.start_y, dead_enemy.vel_y,
+                                     dead_enemy.rotation, dead_enemy.landed)])
+        others.extend([value for fruit in self.fruits for value in (fruit.x, fruit.y, FRUIT_COLOR_INDEX[fruit.color])])
+        others.extend([value for dormant in self.dormant_since.items() for value in dormant])
+        
+        awake = self.awake_chunks or (0, 0)
+        header = SNAPSHOT_HEADER.pack(self.state.value, self.level, self.sim_frame,
+                                      self.fruit_colors_drawn, self.awake_chunks is not None, awake[0], awake[1],
+                                      len(self.players), len(self.enemies), len(self.rainbows), len(self.dead_enemies), len(self.fruits),
+                                      len(self.dormant_since))
+        return b"".join((header, values.tobytes(), enemy_bytes, others.tobytes()))
+    
+    def snapshot_enemies(self):
+        """SNAPSHOT_ENEMY records for every living enemy, in the enemy list's order"""
+        if not self.dormant_since:
+            return self.snapshot_enemy_chunks(None, None)
+        # A dormant chunk's enemies stay put until it wakes or is refreshed (which changes its
+        # dormant_since), so their records are packed once and shared by every snapshot meanwhile
+        parts = []
+        awake_packed = False
+        for chunk in self.enemy_chunks:
+            since = self.dormant_since.get(chunk)
+            if since is None:
+                # The awake chunks are one run in chunk order, so they are packed together
+                if not awake_packed:
+                    parts.append(self.snapshot_enemy_chunks(*self.awake_chunks))
+                    awake_packed = True
+                continue
+            cached = self.dormant_records.get(chunk)
+            if cached is None or cached[0] != since:
+                cached = self.dormant_records[chunk] = (since, self.snapshot_enemy_chunks(chunk, chunk))
+            parts.append(cached[1])
+        return b"".join(parts)
+    
+    def snapshot_enemy_chunks(self, first, last):
+        """Pack the living enemies of chunks first to last, or of every chunk when they are None"""
+        if self.enemy_store is not None:
+            return self.enemy_store.snapshot_records(slice(None) if first is None else self.store_rows(first, last))
+        if first is None:
+            enemies = self.enemies
+        else:
+            enemies = [enemy for chunk in range(first, last + 1) for enemy in self.enemy_chunks.get(chunk, ())]
+        pack = SNAPSHOT_ENEMY.pack
+        return b"".join([pack(enemy.number, enemy.x, enemy.direction, enemy.frame_counter, enemy.animation_frame)
+                         for enemy in enemies])
+    
+    def restore(self, data):
+        """Return to the state captured by snapshot()"""
+        (state, level, self.sim_frame, fruit_colors_drawn, awake_known, first, last, player_count,
+         enemy_count, rainbow_count, dead_enemy_count, fruit_count, dormant_count) = SNAPSHOT_HEADER.unpack_from(data)
+        self.state = GameState(state)
+        self.seek_fruit_colors(fruit_colors_drawn)
+        
+        offset = SNAPSHOT_HEADER.size
+        player_format = f"={SNAPSHOT_FIELDS['player']}d"
+        for index, player in enumerate(self.players[:player_count]):
+            (player.x, player.y, player.vel_x, player.vel_y, on_ground, facing_right, rainbow_cooldown,
+             jump_buffer, coyote_frames, score, caught) = struct.unpack_from(player_format, data, offset)
+            self.scores[index] = int(score)
+            self.caught[index] = bool(caught)
+            player.on_ground = bool(on_ground)
+            player.facing_right = bool(facing_right)
+            player.rainbow_cooldown = int(rainbow_cooldown)
+            player.jump_buffer = int(jump_buffer)
+            player.coyote_frames = int(coyote_frames)
+            offset += SNAPSHOT_FIELDS["player"] * 8
+        enemy_data = memoryview(data)[offset:offset + enemy_count * SNAPSHOT_ENEMY.size]
+        offset += len(enemy_data)
+        values = array("d")
+        values.frombytes(data[offset:])
+        
+        # Enemies only ever disappear, so a level reloaded from its file and thinned out to the
+        # snapshot's survivors has them all back; that is skipped while nobody has died since,
+        # unless the snapshot is of another level, whose enemies must come from its own file
+        level_changed = level != self.level
+        if level_changed:
+            self.level = level
+            self.platforms = self.create_level()
+        if self.enemy_store is not None:
+            numbers = self.enemy_store.snapshot_numbers(enemy_data)
+            living = self.enemy_store.number[self.enemy_store.alive].tolist()
+        else:
+            numbers = [number for number, *_ in SNAPSHOT_ENEMY.iter_unpack(enemy_data)]
+            living = [enemy.number for enemy in self.enemies]
+        if level_changed or numbers != living:
+            self.enemies = self.create_enemies()
+            survivors = set(numbers)
+            self.remove_enemies({enemy: True for enemy in self.enemies if enemy.number not in survivors})
+        if self.enemy_store is not None:
+            self.enemy_store.restore_records(enemy_data)
+        else:
+            for enemy, (_, x, direction, frame_counter, animation_frame) in zip(
+                    self.enemies, SNAPSHOT_ENEMY.iter_unpack(enemy_data)):
+                enemy.direction = direction
+                enemy.frame_counter = frame_counter
+                enemy.animation_frame = animation_frame
+                if enemy.x != x:  # Dormant enemies haven't moved
+                    enemy.x = x
+                    self.enemy_grid.move(enemy, (enemy.x, enemy.y, enemy.width, enemy.height))
+        
+        index = 0
+        def records(kind, count):
+            """Split the next count entities' values off the snapshot"""
+            nonlocal index
+            size = SNAPSHOT_FIELDS[kind]
+            start, index = index, index + count * size
+            return [values[record:record + size] for record in range(start, index, size)]
+        
+        self.clear_entities()
+        for (start_x, start_y, direction, x, y, lifetime, solid, solid_timer, arc_progress, dissolving,
+             dissolve_timer, owner) in records("rainbow", rainbow_count):
+            rainbow = self.rainbow_pool.acquire(start_x, start_y, int(direction), int(owner))
+            rainbow.x = rainbow.prev_x = x
+            rainbow.y = rainbow.prev_y = y
+            rainbow.lifetime = int(lifetime)
+            rainbow.solid = bool(solid)
+            if rainbow.solid:
+                rainbow.width = rainbow.bridge_width
+                rainbow.height = rainbow.bridge_height
+            rainbow.solid_timer = int(solid_timer)
+            rainbow.arc_progress = int(arc_progress)
+            rainbow.dissolving = bool(dissolving)
+            rainbow.dissolve_timer = int(dissolve_timer)
+            self.rainbows.append(rainbow)
+        for x, y, start_y, vel_y, rotation, landed in records("dead_enemy", dead_enemy_count):
+            dead_enemy = self.dead_enemy_pool.acquire(x, start_y)
+            dead_enemy.y = dead_enemy.prev_y = y
+            dead_enemy.vel_y = vel_y
+            dead_enemy.rotation = int(rotation)
+            dead_enemy.landed = bool(landed)
+            self.dead_enemies.append(dead_enemy)
+        for x, y, color in records("fruit", fruit_count):
+            fruit = self.fruit_pool.acquire(x, y, FRUIT_COLORS[int(color)])
+            self.fruits.append(fruit)
+            self.fruit_grid.insert(fruit, (fruit.x, fruit.y, fruit.width, fruit.height))
+        
+        self.dormant_since = {int(chunk): int(since) for chunk, since in records("dormant", dormant_count)}
+        self.dormant_records = {}
+        self.awake_chunks = (first, last) if awake_known else None
+        self.all_chunks_awake = not self.dormant_since
+        self.active_rows = None
+        self.collect_active_enemies()
+    
+    def checksum(self):
+        """CRC32 of the simulation state, to pinpoint the first frame where two runs differ"""
+        player = self.player
+        values = [self.state.value, self.score, self.level, player.x, player.y, player.vel_x, player.vel_y,
+                  player.on_ground, player.facing_right, player.rainbow_cooldown, player.jump_buffer,
+                  player.coyote_frames]
+        for enemy in self.enemies:
+            values += (enemy.x, enemy.y, enemy.direction, enemy.frame_counter)
+        for rainbow in self.rainbows:
+            values += (rainbow.x, rainbow.y, rainbow.solid, rainbow.dissolving,
+                       rainbow.arc_progress, rainbow.solid_timer, rainbow.dissolve_timer)
+        for dead_enemy in self.dead_enemies:
+            values += (dead_enemy.x, dead_enemy.y)
+        for fruit in self.fruits:
+            values += (fruit.x, fruit.y, *fruit.color)
+        # Last, so one-player checksums are unchanged
+        for player in self.players[1:]:
+            values += (player.x, player.y, player.vel_x, player.vel_y, player.on_ground, player.facing_right,
+                       player.rainbow_cooldown, player.jump_buffer, player.coyote_frames)
+        if self.player_count > 1:
+            values += self.scores
+            values += self.caught
+            values += [rainbow.owner for rainbow in self.rainbows]
+        return zlib.crc32(array("d", values).tobytes())
+        
+    def log(self, message):
+        if self.verbose:
+            print(message)
+        
+    def update(self, inputs):
+        """Simulate one frame of play with the given Inputs (a tuple with several players); step() calls it"""
         if self.state == GameState.PLAYING:
-            # Update player
-            jumped_rainbow = self.player.update(self.platforms, self.rainbows)
-            if jumped_rainbow is False:  # Player died
-                self.state = GameState.GAME_OVER
-            elif jumped_rainbow is not True:  # Player jumped on a rainbow (returned Rainbow object)
-                # Dissolve the rainbow (monster killing will happen during fall)
-                jumped_rainbow.dissolve()
+            lap = self.profiler.lap
+            
+            # Update players
+            self.index_rainbows()
+            for index, (player, flags) in enumerate(zip(self.players, per_player(inputs, self.player_count))):
+                if self.caught[index]:
+                    continue  # Out of the game; the others play on
+                jumped_rainbow = player.update(self.platform_grid, self.rainbow_grid, flags, self.world_height)
+                if jumped_rainbow is False:  # Player died
+                    self.catch_player(index)
+                elif jumped_rainbow is not True:  # Player jumped on a rainbow (returned Rainbow object)
+                    # Dissolve the rainbow (monster killing will happen during fall)
+                    jumped_rainbow.dissolve()
+            self.sim_frame += 1
+            self.schedule_chunks()  # Wake the chunks the player or a rainbow has moved near
+            lap("player")
                 
             # Check rainbow projectile-enemy collisions FIRST (before rainbows can become solid)
-            rainbows_to_remove = []
-            for rainbow in self.rainbows:
-                if not rainbow.solid:  # Only projectile rainbows can kill enemies
-                    # Create a collision rect for the rainbow projectile (matches the 4-pixel radius circle)
-                    rainbow_rect = pygame.Rect(rainbow.x - 4, rainbow.y - 4, 8, 8)
-                    hit_enemy = False
-                    for enemy in self.enemies[:]:  # Use slice to avoid modification during iteration
-                        enemy_rect = pygame.Rect(enemy.x, enemy.y, enemy.width, enemy.height)
-                        if rainbow_rect.colliderect(enemy_rect):
-                            # Create death animation
-                            dead_enemy = DeadEnemy(enemy.x, enemy.y)
-                            self.dead_enemies.append(dead_enemy)
-                            # Remove enemy from active enemies
-                            self.enemies.remove(enemy)
-                            self.score += 100
-                            print(f"Rainbow projectile killed enemy! Score: {self.score}")  # Debug message
-                            rainbows_to_remove.append(rainbow)
-                            hit_enemy = True
-                            break  # Rainbow can only hit one enemy
-                                
-            # Remove rainbows that hit enemies
-            for rainbow in rainbows_to_remove:
-                if rainbow in self.rainbows:
-                    self.rainbows.remove(rainbow)
+            self.kill_enemies_hit_by_projectiles()
+            lap("collide_projectiles")
                 
             # Update rainbows AFTER projectile collision check (so dissolving rainbows start falling)
-            self.rainbows = [rainbow for rainbow in self.rainbows if rainbow.update()]
+            self.rainbow_pool.keep_where(self.rainbows, Rainbow.update)  # Expired rainbows go back to the pool
+            self.index_rainbows()
+            lap("rainbows")
             
             # Check falling rainbow-enemy collisions BEFORE enemy movement (so enemies get killed instead of pushed)
-            enemies_to_remove = []  # Track enemies to remove to avoid modification during iteration
-            for rainbow in self.rainbows:
-                if rainbow.dissolving:
-                    # Create collision rect for the falling rainbow
-                    rainbow_rect = pygame.Rect(rainbow.x, rainbow.y, rainbow.bridge_width, rainbow.bridge_height)
-                    for enemy in self.enemies:
-                        if enemy not in enemies_to_remove:  # Don't check enemies already marked for removal
-                            enemy_rect = pygame.Rect(enemy.x, enemy.y, enemy.width, enemy.height)
-                            if rainbow_rect.colliderect(enemy_rect):
-                                # Create death animation
-                                dead_enemy = DeadEnemy(enemy.x, enemy.y)
-                                self.dead_enemies.append(dead_enemy)
-                                # Mark enemy for removal
-                                enemies_to_remove.append(enemy)
-                                self.score += 100
-                                print(f"Falling rainbow killed enemy! Score: {self.score}")  # Debug message
-                                
-            # Remove all enemies that were killed by falling rainbows
-            for enemy in enemies_to_remove:
-                if enemy in self.enemies:
-                    self.enemies.remove(enemy)
+            self.kill_enemies_under_falling_rainbows()
+            lap("collide_falling_before")
                 
             # Update enemies AFTER falling rainbow collision check
-            for enemy in self.enemies:
-                enemy.update(self.platforms, self.rainbows)
+            if self.enemy_store is not None:
+                self.enemy_store.update(self.rainbows, self.active_enemy_rows())
+            else:
+                for enemy in self.active_enemies:
+                    enemy.update(self.platform_grid, self.rainbow_grid)
+                    self.enemy_grid.move(enemy, (enemy.x, enemy.y, enemy.width, enemy.height))
+            lap("enemies")
                 
             # Check for falling rainbow collisions (chain reaction)
-            newly_triggered = []  # Track rainbows that were just triggered this frame
-            for i, rainbow1 in enumerate(self.rainbows):
-                if rainbow1.dissolving and rainbow1.dissolve_timer > 1:  # Only after first frame of dissolution
-                    rainbow1_rect = pygame.Rect(rainbow1.x, rainbow1.y, rainbow1.bridge_width, rainbow1.bridge_height)
-                    for j, rainbow2 in enumerate(self.rainbows):
-                        if (i != j and rainbow2.solid and not rainbow2.dissolving and 
-                            rainbow2 not in newly_triggered):  # Different rainbow that's solid, not falling, and not already triggered this frame
-                            
-                            # More precise collision detection - check if rainbows actually overlap
-                            rainbow2_rect = pygame.Rect(rainbow2.x, rainbow2.y, rainbow2.bridge_width, rainbow2.bridge_height)
-                            
-                            # Check for actual overlap (not just touching edges)
-                            if (rainbow1_rect.colliderect(rainbow2_rect) and 
-                                abs(rainbow1.y - rainbow2.y) < rainbow1.bridge_height):  # Vertical overlap check
-                                
-                                # Trigger chain reaction - make the second rainbow start falling
-                                if rainbow2.dissolve():  # Only trigger if dissolve() returns True (wasn't already dissolving)
-                                    newly_triggered.append(rainbow2)
-                                    print(f"Chain reaction! Falling rainbow triggered another rainbow to fall!")  # Debug message
+            self.trigger_chain_reactions()
+            lap("collide_chain")
             
             # Check falling rainbow-enemy collisions (when rainbows are dissolving)
-            enemies_to_remove = []  # Track enemies to remove to avoid modification during iteration
-            for rainbow in self.rainbows:
-                if rainbow.dissolving:
-                    # Create collision rect for the falling rainbow
-                    rainbow_rect = pygame.Rect(rainbow.x, rainbow.y, rainbow.bridge_width, rainbow.bridge_height)
-                    for enemy in self.enemies:
-                        if enemy not in enemies_to_remove:  # Don't check enemies already marked for removal
-                            enemy_rect = pygame.Rect(enemy.x, enemy.y, enemy.width, enemy.height)
-                            if rainbow_rect.colliderect(enemy_rect):
-                                # Create death animation
-                                dead_enemy = DeadEnemy(enemy.x, enemy.y)
-                                self.dead_enemies.append(dead_enemy)
-                                # Mark enemy for removal
-                                enemies_to_remove.append(enemy)
-                                self.score += 100
-                                print(f"Falling rainbow killed enemy! Score: {self.score}")  # Debug message
-                                
-            # Remove all enemies that were killed by falling rainbows
-            for enemy in enemies_to_remove:
-                if enemy in self.enemies:
-                    self.enemies.remove(enemy)
+            self.kill_enemies_under_falling_rainbows()
+            lap("collide_falling_after")
                                 
             # Check player-enemy collisions
-            player_rect = pygame.Rect(self.player.x, self.player.y, self.player.width, self.player.height)
-            for enemy in self.enemies:
-                enemy_rect = pygame.Rect(enemy.x, enemy.y, enemy.width, enemy.height)
-                if player_rect.colliderect(enemy_rect):
-                    self.state = GameState.GAME_OVER
+            player_rects = [(index, pygame.Rect(player.x, player.y, player.width, player.height))
+                            for index, player in enumerate(self.players) if not self.caught[index]]
+            for index, player_rect in player_rects:
+                for enemy in self.enemy_grid.query(player_rect):
+                    enemy_rect = pygame.Rect(enemy.x, enemy.y, enemy.width, enemy.height)
+                    if player_rect.colliderect(enemy_rect):
+                        self.catch_player(index)
+            lap("collide_player_enemies")
                     
             # Update dead enemies and create fruits when they land
-            dead_enemies_to_remove = []
+            any_landed = False
             for dead_enemy in self.dead_enemies:
                 if dead_enemy.update():  # Returns True when animation is complete
                     # Create fruit at the dead enemy's position
-                    fruit = Fruit(dead_enemy.x + 4, dead_enemy.y + 4)  # Center fruit on enemy position
+                    fruit = self.fruit_pool.acquire(dead_enemy.x + 4, dead_enemy.y + 4,  # Center fruit on enemy position
+                                                    self.next_fruit_color())
                     self.fruits.append(fruit)
-                    dead_enemies_to_remove.append(dead_enemy)
+                    self.fruit_grid.insert(fruit, (fruit.x, fruit.y, fruit.width, fruit.height))
+                    any_landed = True
                     
             # Remove completed death animations
-            for dead_enemy in dead_enemies_to_remove:
-                self.dead_enemies.remove(dead_enemy)
+            if any_landed:
+                self.dead_enemy_pool.keep_where(self.dead_enemies, lambda dead_enemy: not dead_enemy.landed)
+                
+            lap("dead_enemies")
                 
             # Update fruits
             for fruit in self.fruits:
                 fruit.update()
+            lap("fruits")
                 
             # Check player-fruit collisions
-            for fruit in self.fruits[:]:  # Use slice to avoid modification during iteration
-                if not fruit.collected:
-                    fruit_rect = pygame.Rect(fruit.x, fruit.y, fruit.width, fruit.height)
-                    if player_rect.colliderect(fruit_rect):
-                        fruit.collected = True
-                        self.fruits.remove(fruit)
-                        self.score += 20
-                        print(f"Collected fruit! Score: {self.score}")  # Debug message
+            any_collected = False
+            for index, player_rect in player_rects:
+                for fruit in self.fruit_grid.query(player_rect):  # Only fruit near the player
+                    if not fruit.collected:
+                        fruit_rect = pygame.Rect(fruit.x, fruit.y, fruit.width, fruit.height)
+                        if player_rect.colliderect(fruit_rect):
+                            fruit.collected = True
+                            self.fruit_grid.remove(fruit)
+                            any_collected = True
+                            self.scores[index] += 20
+                            self.log(f"Collected fruit! Score: {self.score}")  # Debug message
+            if any_collected:
+                self.fruit_pool.keep_where(self.fruits, lambda fruit: not fruit.collected)
+            lap("collide_fruit")
                                 
             # Check if level is complete - all enemies defeated AND all fruit collected
             if len(self.enemies) == 0 and len(self.dead_enemies) == 0 and len(self.fruits) == 0:
                 self.state = GameState.LEVEL_COMPLETE
                 
-    def draw(self):
-        self.screen.fill((134, 206, 250))  # Light blue background #86CEFA
+    def index_rainbows(self):
+        """Re-insert every rainbow into the rainbow grid (they move every frame)"""
+        self.rainbow_grid.clear()
+        for rainbow in self.rainbows:
+            self.rainbow_grid.insert(rainbow, rainbow.get_bounds())
+    
+    def kill_enemies_under_falling_rainbows(self):
+        """Kill every enemy touched by a dissolving (falling) rainbow"""
+        enemies_to_remove = {}  # Ordered set of killed enemies, removed after the loop
+        for rainbow in self.rainbows:
+            if rainbow.dissolving:
+                # Create collision rect for the falling rainbow
+                rainbow_rect = pygame.Rect(rainbow.x, rainbow.y, rainbow.bridge_width, rainbow.bridge_height)
+                for enemy in self.enemy_grid.query(rainbow_rect):
+                    if enemy not in enemies_to_remove:  # Don't check enemies already marked for removal
+                        enemy_rect = pygame.Rect(enemy.x, enemy.y, enemy.width, enemy.height)
+                        if rainbow_rect.colliderect(enemy_rect):
+                            # Create death animation
+                            dead_enemy = self.dead_enemy_pool.acquire(enemy.x, enemy.y)
+                            self.dead_enemies.append(dead_enemy)
+                            # Mark enemy for removal
+                            enemies_to_remove[enemy] = True
+                            self.scores[rainbow.owner] += 100
+                            self.log(f"Falling rainbow killed enemy! Score: {self.score}")  # Debug message
         
-        # Draw instructions FIRST (behind everything else)
-        font_small = pygame.font.Font(None, 24)
-        instructions = [
-            "Arrow Keys / WASD: Move and Jump",
-            "X / Left Ctrl: Shoot Rainbow",
-            "Defeat enemies to create fruit (20 points each)!",
-            "Create rainbow bridges to reach higher platforms!"
-        ]
-        for i, instruction in enumerate(instructions):
-            text = font_small.render(instruction, True, GREY)
-            self.screen.blit(text, (400, SCREEN_HEIGHT - 200 + i * 25))
+        # Remove all enemies that were killed by falling rainbows
+        if enemies_to_remove:
+            self.remove_enemies(enemies_to_remove)
+    
+    def trigger_chain_reactions(self):
+        """Make solid rainbows touching a falling one fall too, following whole chains this frame"""
+        # Only rainbows past their first frame of dissolution start a chain reaction
+        sources = [rainbow for rainbow in self.rainbows if rainbow.dissolving and rainbow.dissolve_timer > 1]
+        if not sources:
+            return
         
-        # Draw platforms
-        for platform in self.platforms:
-            platform.draw(self.screen)
-            
-        # Draw enemies
-        for enemy in self.enemies:
-            enemy.draw(self.screen)
-            
-        # Draw dead enemies (death animations)
-        for dead_enemy in self.dead_enemies:
-            dead_enemy.draw(self.screen)
-            
-        # Draw fruits
-        for fruit in self.fruits:
-            fruit.draw(self.screen)
-            
-        # Draw rainbows
-        for rainbow in self.rainbows:
-            rainbow.draw(self.screen)
-            
-        # Draw player
-        self.player.draw(self.screen)
+        rects = {rainbow: pygame.Rect(rainbow.x, rainbow.y, rainbow.bridge_width, rainbow.bridge_height)
+                 for rainbow in self.rainbows if rainbow.solid}
         
-        # Draw UI (score and level - always on top)
-        font = pygame.font.Font(None, 36)
-        score_text = font.render(f"Score: {self.score}", True, BLACK)
-        self.screen.blit(score_text, (10, 10))
+        # Sweep and prune along whichever axis spreads the bridges out more (x for bridges side by
+        # side, y for stacks), measured in bridge widths/heights
+        lefts = [rect.left for rect in rects.values()]
+        tops = [rect.top for rect in rects.values()]
+        x_spread = (max(lefts) - min(lefts)) / sources[0].bridge_width
+        y_spread = (max(tops) - min(tops)) / sources[0].bridge_height
+        if y_spread > x_spread:
+            extents = [(rect.top, rect.bottom, rainbow) for rainbow, rect in rects.items()]
+        else:
+            extents = [(rect.left, rect.right, rainbow) for rainbow, rect in rects.items()]
+        extents.sort(key=lambda extent: extent[0])
+        
+        # Walk the bridges in order, keeping the ones whose extent is still open, so only bridges
+        # that overlap on the sweep axis are ever compared
+        touching = {rainbow: [] for rainbow in rects}
+        open_bridges = []  # (end of extent, rainbow)
+        for start, end, rainbow in extents:
+            open_bridges = [entry for entry in open_bridges if entry[0] > start]
+            rect = rects[rainbow]
+            for _, other in open_bridges:
+                if rect.colliderect(rects[other]):
+                    touching[rainbow].append(other)
+                    touching[other].append(rainbow)
+            open_bridges.append((end, rainbow))
+        
+        # Spread the collapse outwards; rainbows triggered now pass it on in the same frame
+        triggered = set()
+        queue = deque(sources)
+        while queue:
+            rainbow1 = queue.popleft()
+            for rainbow2 in touching[rainbow1]:
+                # Check for actual overlap (not just touching edges)
+                if (rainbow2 not in triggered and 
+                    abs(rainbow1.y - rainbow2.y) < rainbow1.bridge_height):  # Vertical overlap check
+                    
+                    # Trigger chain reaction - make the second rainbow start falling
+                    if rainbow2.dissolve():  # Only trigger if dissolve() returns True (wasn't already dissolving)
+                        triggered.add(rainbow2)
+                        queue.append(rainbow2)
+                        self.log("Chain reaction! Falling rainbow triggered another rainbow to fall!")  # Debug message
+    
+    def kill_enemies_hit_by_projectiles(self):
+        """Hit-test every rainbow projectile against every enemy in one batch, then apply the kills"""
+        projectiles = [rainbow for rainbow in self.rainbows if not rainbow.solid]  # Only projectile rainbows can kill enemies
+        if not projectiles or not len(self.enemies):
+            return
         
-        level_text = font.render(f"Level: {self.level}", True, BLACK)
-        self.screen.blit(level_text, (10, 50))
+        # Create a collision rect for each rainbow projectile (matches the 4-pixel radius circle)
+        projectile_rects = [pygame.Rect(rainbow.x - 4, rainbow.y - 4, 8, 8) for rainbow in projectiles]
+        if self.enemy_store is not None:
+            hits = self.enemy_store.collide_all(projectile_rects)
+        else:
+            # Build the enemy rects once and let pygame test each projectile against all of them
+            # (suspended enemies are far from the player, so out of reach)
+            enemies = self.active_enemies
+            enemy_rects = [pygame.Rect(enemy.x, enemy.y, enemy.width, enemy.height) for enemy in enemies]
+            hits = [[enemies[index] for index in rect.collidelistall(enemy_rects)] for rect in projectile_rects]
+        
+        killed = {}  # Enemies killed this frame, in order, and the rainbow that killed each
+        spent_rainbows = set()
+        for rainbow, enemies_hit in zip(projectiles, hits):
+            for enemy in enemies_hit:
+                if enemy not in killed:  # An enemy can only be killed by the first projectile to reach it
+                    killed[enemy] = rainbow
+                    spent_rainbows.add(rainbow)
+                    break  # Rainbow can only hit one enemy
+        if not killed:
+            return
+        
+        # Apply every kill in one pass
+        for enemy, rainbow in killed.items():
+            # Create death animation
+            self.dead_enemies.append(self.dead_enemy_pool.acquire(enemy.x, enemy.y))
+            self.scores[rainbow.owner] += 100
+            self.log(f"Rainbow projectile killed enemy! Score: {self.score}")  # Debug message
+        self.remove_enemies(killed)
+        
+        # Remove rainbows that hit enemies
+        self.rainbow_pool.keep_where(self.rainbows, lambda rainbow: rainbow not in spent_rainbows)
+    
+    def remove_enemies(self, killed):
+        """Drop a collection of killed enemies from the enemy list and index"""
+        for enemy in killed:
+            self.enemy_grid.remove(enemy)
+            self.dormant_records.pop(int(enemy.y) // CHUNK_HEIGHT, None)
+        if self.enemy_store is None:
+            self.enemies = [enemy for enemy in self.enemies if enemy not in killed]
+            for enemy in killed:
+                self.enemy_chunks[int(enemy.y) // CHUNK_HEIGHT].remove(enemy)
+            self.collect_active_enemies()
+    
+    def save_positions(self):
+        """Record where every moving object is before a simulation step, for interpolated drawing"""
+        for entity in (*self.players, *self.rainbows, *self.dead_enemies):
+            entity.prev_x = entity.x
+            entity.prev_y = entity.y
+        if self.enemy_store is not None:
+            self.enemy_store.save_positions()
+        else:
+            for enemy in self.active_enemies:
+                enemy.prev_x = enemy.x
+                enemy.prev_y = enemy.y
+    
+    def draw(self, alpha=1.0):
+        """Draw the game, alpha of the way from the previous simulation step to the current one"""
+        lap = self.profiler.lap
+        self.update_camera(alpha)
+        
+        # Only take the partial path while playing on an unchanged background;
+        # overlays, level changes, camera moves and the first frame repaint everything, and so
+        # does the first frame back from an overlay (e.g. after rewinding out of GAME OVER)
+        dirty = (self.dirty_rects and self.state == GameState.PLAYING and self.drawn_state == GameState.PLAYING and
+                 self.drawn_background is self.background_chunks and self.drawn_camera_y == self.camera_y)
+        self.drawn_state = self.state
+        if dirty:
+            # Erase last frame's sprites by restoring the background underneath them
+            for rect in self.previous_rects:
+                self.blit_background(rect)
+        else:
+            # Sky, instructions and platforms come pre-rendered from the level background
+            self.blit_background(self.screen.get_rect())
+            self.drawn_background = self.background_chunks
+            self.drawn_camera_y = self.camera_y
+        lap("draw_background")
+        
+        rects = self.draw_sprites(alpha)
+        
+        if self.state != GameState.PLAYING:
+            # Overlay screens are static, so only rebuild them when what they show changes
+            overlay_key = (self.state, self.level, tuple(self.scores))
+            if overlay_key != self.overlay_key:
+                self.overlay_blits = self.build_overlay()
+                self.overlay_key = overlay_key
+            self.screen.blits(self.overlay_blits)
+            lap("draw_overlay")
+        
+        if self.show_profiler:
+            rects.append(self.draw_profiler())
+            lap("draw_profiler")
+        
+        if dirty:
+            # Push both the erased old positions and the freshly drawn new ones
+            pygame.display.update(self.previous_rects + rects)
+        else:
+            pygame.display.flip()
+        self.previous_rects = rects
+        lap("present")
+        
+        # Input-to-display latency: from collecting a key press to the first frame showing its effect
+        latency = self.keyboard.displayed()
+        if latency is not None:
+            self.profiler.record_latency(latency)
+    
+    def build_overlay(self):
+        """Prepare the blits for the GAME OVER / LEVEL COMPLETE / WIN screen"""
+        blits = []
+        shade = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        shade.set_alpha(128)
+        shade.fill(BLACK)
         
         if self.state == GameState.GAME_OVER:
             # Draw game over screen
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            overlay.set_alpha(128)
-            overlay.fill(BLACK)
-            self.screen.blit(overlay, (0, 0))
+            blits.append((shade, (0, 0)))
             
-            font_large = pygame.font.Font(None, 72)
-            game_over_text = font_large.render("GAME OVER", True, RED)
+            game_over_text = self.text_cache.render("GAME OVER", 72, RED)
             text_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
-            self.screen.blit(game_over_text, text_rect)
+            blits.append((game_over_text, text_rect))
             
-            restart_text = font.render("Press R to Restart", True, WHITE)
+            restart_text = self.text_cache.render("Press R to Restart", 36, WHITE)
             text_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20))
-            self.screen.blit(restart_text, text_rect)
+            blits.append((restart_text, text_rect))
+            
+            if self.player_count > 1:
+                # Head to head, whoever has the most points when everyone is out wins
+                blits.extend(self.result_blits(SCREEN_HEIGHT // 2 + 70))
             
         elif self.state == GameState.LEVEL_COMPLETE:
             # Draw level complete screen
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            overlay.set_alpha(128)
-            overlay.fill(BLACK)
-            self.screen.blit(overlay, (0, 0))
+            blits.append((shade, (0, 0)))
             
-            font_large = pygame.font.Font(None, 72)
-            complete_text = font_large.render("LEVEL COMPLETE!", True, GREEN)
+            complete_text = self.text_cache.render("LEVEL COMPLETE!", 72, GREEN)
             text_rect = complete_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 80))
-            self.screen.blit(complete_text, text_rect)
+            blits.append((complete_text, text_rect))
             
-            score_text = font.render(f"Score: {self.score}", True, WHITE)
+            score_text = self.text_cache.render(self.score_line(), 36, WHITE)
             text_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 20))
-            self.screen.blit(score_text, text_rect)
+            blits.append((score_text, text_rect))
             
-            if self.level < 2:
+            if self.level < len(self.levels):
                 # Show next level option
-                next_text = font.render("Press SPACE for Next Level", True, YELLOW)
+                next_text = self.text_cache.render("Press SPACE for Next Level", 36, YELLOW)
                 text_rect = next_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20))
-                self.screen.blit(next_text, text_rect)
+                blits.append((next_text, text_rect))
             else:
                 # Show game complete option
-                win_text = font.render("Press SPACE to Complete Game", True, YELLOW)
+                win_text = self.text_cache.render("Press SPACE to Complete Game", 36, YELLOW)
                 text_rect = win_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20))
-                self.screen.blit(win_text, text_rect)
+                blits.append((win_text, text_rect))
                 
         elif self.state == GameState.WIN:
             # Draw win screen
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            overlay.set_alpha(128)
-            overlay.fill(BLACK)
-            self.screen.blit(overlay, (0, 0))
+            blits.append((shade, (0, 0)))
             
-            font_large = pygame.font.Font(None, 72)
-            win_text = font_large.render("CONGRATULATIONS!", True, GOLD)
+            win_text = self.text_cache.render("CONGRATULATIONS!", 72, GOLD)
             text_rect = win_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 80))
-            self.screen.blit(win_text, text_rect)
+            blits.append((win_text, text_rect))
             
-            complete_text = font.render("You completed all levels!", True, WHITE)
+            complete_text = self.text_cache.render("You completed all levels!", 36, WHITE)
             text_rect = complete_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 20))
-            self.screen.blit(complete_text, text_rect)
+            blits.append((complete_text, text_rect))
             
-            final_score_text = font.render(f"Final Score: {self.score}", True, YELLOW)
+            final_score_text = self.text_cache.render(f"Final {self.score_line()}", 36, YELLOW)
             text_rect = final_score_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20))
-            self.screen.blit(final_score_text, text_rect)
+            blits.append((final_score_text, text_rect))
             
-            restart_text = font.render("Press R to Restart", True, WHITE)
+            restart_text = self.text_cache.render("Press R to Restart", 36, WHITE)
             text_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 60))
-            self.screen.blit(restart_text, text_rect)
+            blits.append((restart_text, text_rect))
+            
+            if self.player_count > 1:
+                blits.extend(self.result_blits(SCREEN_HEIGHT // 2 + 110))
+        
+        return blits
+    
+    def score_line(self):
+        """The score as shown: one number, or every player's score (marking those who are out)"""
+        if self.player_count == 1:
+            return f"Score: {self.score}"
+        return "Score: " + "  ".join(f"P{index + 1} {score}" + (" (out)" if caught else "")
+                                     for index, (score, caught) in enumerate(zip(self.scores, self.caught)))
+    
+    def result_blits(self, y):
+        """Blits announcing the winner of a head-to-head game, centred on y"""
+        winner = self.winner()
+        if winner is None:
+            result_text = self.text_cache.render("It's a draw!", 48, GOLD)
+        else:
+            color = PLAYER_COLORS[winner % len(PLAYER_COLORS)]
+            result_text = self.text_cache.render(f"Player {winner + 1} wins!", 48, color)
+        return [(result_text, result_text.get_rect(center=(SCREEN_WIDTH // 2, y)))]
+    
+    def update_camera(self, alpha=1.0):
+        """Scroll to keep the player vertically centred, without showing anything past the level's ends"""
+        player = self.players[self.camera_player]
+        player_y = int(lerp(player.prev_y, player.y, alpha)) + player.height // 2
+        self.camera_y = min(max(player_y - SCREEN_HEIGHT // 2, 0), self.world_height - SCREEN_HEIGHT)
+    
+    def draw_sprites(self, alpha=1.0):
+        """Draw every moving object in view and the HUD, returning the areas drawn over"""
+        lap = self.profiler.lap
+        rects = []
+        camera_y = self.camera_y
+        # Skip objects outside the view, with a margin for sprites drawn above or around their position
+        top = camera_y - VIEW_MARGIN
+        bottom = camera_y + SCREEN_HEIGHT + VIEW_MARGIN
+        
+        # Draw enemies
+        view = (0, top, SCREEN_WIDTH, bottom - top)
+        if self.enemy_store is not None:
+            # Straight from the arrays: going through an EnemyView per enemy would be several times slower
+            rects.extend(self.enemy_store.draw(self.screen, alpha, camera_y,
+                                               view if self.world_height > SCREEN_HEIGHT else None))
+        else:
+            if self.world_height > SCREEN_HEIGHT:
+                enemies = self.enemy_grid.query(view)
+            else:
+                enemies = self.enemies  # Everything is in view
+            for enemy in enemies:
+                rects.append(enemy.draw(self.screen, alpha, camera_y))
+        lap("draw_enemies")
+            
+        # Draw dead enemies (death animations)
+        for dead_enemy in self.dead_enemies:
+            if top < dead_enemy.y < bottom:
+                rects.append(dead_enemy.draw(self.screen, alpha, camera_y))
+        lap("draw_dead_enemies")
+            
+        # Draw fruits
+        for fruit in self.fruits:
+            if top < fruit.y < bottom:
+                rects.append(fruit.draw(self.screen, alpha, camera_y))
+        lap("draw_fruits")
+            
+        # Draw rainbows
+        for rainbow in self.rainbows:
+            if top < rainbow.y < bottom:
+                rects.append(rainbow.draw(self.screen, alpha, camera_y))
+        lap("draw_rainbows")
+            
+        # Draw players, except those already out
+        for player, caught in zip(self.players, self.caught):
+            if not caught:
+                rects.append(player.draw(self.screen, alpha, camera_y))
+        lap("draw_player")
+        
+        # Draw UI (score and level - always on top)
+        score_text = self.text_cache.render_label("score", self.score_line(), 36, BLACK)
+        rects.append(self.screen.blit(score_text, (10, 10)))
         
-        pygame.display.flip()
+        level_text = self.text_cache.render_label("level", f"Level: {self.level}", 36, BLACK)
+        rects.append(self.screen.blit(level_text, (10, 50)))
+        lap("draw_hud")
+        
+        # Objects that drew nothing (e.g. already landed) report no area;
+        # widen the rest slightly to cover antialiasing and float truncation
+        return [rect.inflate(2, 2) for rect in rects if rect]
+    
+    def draw_profiler(self):
+        """Draw the frame timing overlay in the top right corner"""
+        # The numbers change every frame, so only re-render them four times a second
+        if self.profiler_surface is None or self.profiler.frame_number >= self.profiler_refresh_frame:
+            self.profiler_surface = self.render_profiler()
+            self.profiler_refresh_frame = self.profiler.frame_number + FPS // 4
+        return self.screen.blit(self.profiler_surface,
+                                (SCREEN_WIDTH - self.profiler_surface.get_width() - 10, 10))
+    
+    def render_profiler(self):
+        """Render the rolling average and p99 of every timed phase into a panel"""
+        font = self.text_cache.font(20)
+        rows = [("phase", "avg ms", "p99 ms")]
+        for phase, average, p99 in self.profiler.stats():
+            rows.append((phase, f"{average:.2f}", f"{p99:.2f}"))
+        
+        line_height = 16
+        panel = pygame.Surface((250, len(rows) * line_height + 8), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        for i, (phase, average, p99) in enumerate(rows):
+            y = 4 + i * line_height
+            color = YELLOW if i == 0 or phase in ("frame", "input_latency") else WHITE
+            panel.blit(font.render(phase, True, color), (6, y))
+            # Right-align the numbers so the columns line up
+            average_text = font.render(average, True, color)
+            panel.blit(average_text, (180 - average_text.get_width(), y))
+            p99_text = font.render(p99, True, color)
+            panel.blit(p99_text, (244 - p99_text.get_width(), y))
+        return panel
         
     def run(self):
+        profiler = self.profiler
         running = True
+        accumulator = 0.0  # Real time not yet simulated
+        last_time = time.perf_counter()
         while running:
+            profiler.begin_frame()
             running = self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+            profiler.lap("events")
+            
+            # Run as many fixed steps as real time has passed, so game speed doesn't
+            # depend on the frame rate; a very long stall is dropped instead of replayed
+            now = time.perf_counter()
+            accumulator = min(accumulator + now - last_time, MAX_STEPS_PER_FRAME * SIM_DT)
+            last_time = now
+            while accumulator >= SIM_DT:
+                self.save_positions()
+                profiler.lap("save_positions")
+                self.step(self.keyboard.take())
+                accumulator -= SIM_DT
+            
+            self.draw(accumulator / SIM_DT)
+            self.clock.tick(self.render_fps)
+            profiler.lap("tick")
+            profiler.end_frame()
             
+        profiler.close()
+        if self.recording is not None:
+            self.recording.save(self.record_path)
         pygame.quit()
         sys.exit()
 
+def verify_replay(log, array_enemies=False, levels_dir=LEVELS_DIR):
+    """Replay an InputLog headless; return the first frame whose checksum differs, or None if all match"""
+    game = Game(headless=True, seed=log.seed, array_enemies=array_enemies, levels_dir=levels_dir)
+    step = game.step
+    checksum = game.checksum
+    for frame, (inputs, expected) in enumerate(zip(log.inputs, log.checksums)):
+        step(inputs)
+        if checksum() != expected:
+            return frame
+    return None
+
 if __name__ == "__main__":
-    game = Game()
+    parser = argparse.ArgumentParser(description="Rainbow Islands - Retro Platform Game")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only repaint the parts of the screen that changed each frame")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the game logic without a window as fast as possible")
+    parser.add_argument("--frames", type=int, default=3600,
+                        help="number of frames to simulate in headless mode (default: 3600)")
+    parser.add_argument("--profile-csv", metavar="PATH",
+                        help="write per-phase frame timings (milliseconds) to a CSV file")
+    parser.add_argument("--array-enemies", action="store_true",
+                        help="keep enemies in NumPy arrays and update them all at once (needs numpy)")
+    parser.add_argument("--render-fps", type=int, default=FPS,
+                        help=f"frames drawn per second, e.g. the display's refresh rate; 0 for uncapped "
+                             f"(default: {FPS}); the game itself always runs at {FPS} steps per second")
+    parser.add_argument("--seed", type=int,
+                        help="seed for the game's random numbers (default: random)")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record every frame's inputs and state checksum to a replayable log file")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="replay a recorded log headless and check every frame's state checksum")
+    parser.add_argument("--levels-dir", metavar="DIR", default=LEVELS_DIR,
+                        help="directory holding index.json and the level files (default: levels/)")
+    args = parser.parse_args()
+    if args.seed is not None and not 0 <= args.seed < 2 ** 32:
+        parser.error(f"--seed must be between 0 and {2 ** 32 - 1}")
+    
+    if args.replay:
+        log = InputLog.load(args.replay)
+        start = time.perf_counter()
+        diverged = verify_replay(log, array_enemies=args.array_enemies, levels_dir=args.levels_dir)
+        elapsed = time.perf_counter() - start
+        if diverged is None:
+            print(f"Replayed {len(log)} frames in {elapsed:.2f}s ({len(log) / elapsed:.0f} frames/s): all checksums match")
+            sys.exit()
+        print(f"Replay diverged at frame {diverged} of {len(log)}")
+        sys.exit(1)
+    
+    if args.headless:
+        game = Game(headless=True, profile_csv=args.profile_csv, array_enemies=args.array_enemies,
+                    seed=args.seed, record_path=args.record, levels_dir=args.levels_dir)
+        start = time.perf_counter()
+        for frame in range(args.frames):
+            game.profiler.begin_frame()
+            game.step(Input.NONE)
+            game.profiler.end_frame()
+        elapsed = time.perf_counter() - start
+        game.profiler.close()
+        if game.recording is not None:
+            game.recording.save(args.record)
+        print(f"Simulated {args.frames} frames in {elapsed:.2f}s "
+              f"({args.frames / elapsed:.0f} frames/s), state: {game.state.name}, score: {game.score}")
+        sys.exit()
+    
+    game = Game(dirty_rects=args.dirty_rects, profile_csv=args.profile_csv, array_enemies=args.array_enemies,
+                render_fps=args.render_fps, seed=args.seed, record_path=args.record, levels_dir=args.levels_dir)
     game.run()
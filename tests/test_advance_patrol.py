@@ -0,0 +1,47 @@
+"""Check that catching a dormant enemy up in one go matches updating it frame by frame"""
+
+import os
+import random
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rainbow_islands_game import Enemy, advance_patrol
+
+
+def random_enemy(rng):
+    """An enemy on a random whole-pixel patrol, partway through it and its animation"""
+    start = rng.randrange(0, 700)
+    end = start + rng.randrange(24, 300)  # At least one enemy wide
+    # Mostly inside the patrol, sometimes on or past its ends
+    enemy = Enemy(rng.randrange(start - 30, end - 24 + 30), rng.randrange(0, 600), start, end)
+    enemy.direction = rng.choice((-1, 1))
+    enemy.speed = rng.choice((0, 1, 1, 1, 2, 3, 4))
+    enemy.frame_counter = rng.randrange(enemy.animation_speed)
+    enemy.animation_frame = rng.randrange(enemy.total_frames)
+    return enemy
+
+
+def patrol_state(enemy):
+    return enemy.x, enemy.direction, enemy.frame_counter, enemy.animation_frame
+
+
+def test_catch_up_matches_update_for_whole_pixel_patrols():
+    rng = random.Random(20)
+    for _ in range(20000):
+        stepped = random_enemy(rng)
+        caught_up = Enemy(stepped.x, stepped.y, stepped.patrol_start, stepped.patrol_end)
+        for name in ("direction", "speed", "frame_counter", "animation_frame"):
+            setattr(caught_up, name, getattr(stepped, name))
+        frames = rng.randrange(1, 250)
+
+        for _ in range(frames):
+            stepped.update(None)
+        caught_up.catch_up(frames)
+        assert patrol_state(caught_up) == patrol_state(stepped), (caught_up.patrol_start, caught_up.patrol_end,
+                                                                  frames)
+
+
+def test_advance_patrol_with_no_frames_leaves_the_enemy_alone():
+    assert advance_patrol(50.0, 1, 2, 10.0, 100.0, 0) == (50.0, 1)
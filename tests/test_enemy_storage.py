@@ -0,0 +1,87 @@
+"""Check that enemies kept in NumPy arrays simulate exactly like the plain Enemy list"""
+
+import os
+import random
+import sys
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("numpy")
+
+from rainbow_islands_game import Game, Input
+
+
+def scripted_inputs(seed, frames):
+    """Held moves with random jumps and plenty of shots, restarting every few seconds"""
+    rng = random.Random(seed)
+    hold = 0
+    for frame in range(frames):
+        if hold <= 0:
+            move = rng.choice((Input.NONE, Input.LEFT, Input.RIGHT))
+            hold = rng.randrange(5, 40)
+        hold -= 1
+        inputs = move
+        if rng.random() < 0.08:
+            inputs |= Input.JUMP
+        if rng.random() < 0.15:
+            inputs |= Input.SHOOT
+        if frame % 300 == 299:
+            inputs |= Input.RESTART  # Only does something after a game over
+        yield inputs
+
+
+def add_bridge(game, x, y):
+    """Add a rainbow that has already finished its arc and become a solid bridge"""
+    rainbow = game.rainbow_pool.acquire(x, y, 1)
+    while not rainbow.solid:
+        rainbow.update()
+    game.rainbows.append(rainbow)
+    return rainbow
+
+
+def play_both(setup, inputs, seed=3):
+    """Play the same inputs with list and array enemies, checking their checksums agree every frame
+    
+    Returns how many enemies were killed along the way.
+    """
+    games = [Game(headless=True, seed=seed, rewind_seconds=0),
+             Game(headless=True, seed=seed, rewind_seconds=0, array_enemies=True)]
+    for game in games:
+        setup(game)
+    kills = 0
+    for frame, flags in enumerate(inputs):
+        alive = len(games[0].enemies)
+        listed, stored = [game.step(flags) for game in games]
+        assert listed == stored, f"states differ at frame {frame}"
+        assert games[0].checksum() == games[1].checksum(), f"checksums differ at frame {frame}"
+        assert len(games[0].enemies) == len(games[1].enemies)
+        kills += max(alive - len(games[0].enemies), 0)  # Restarting brings them all back
+    return kills
+
+
+def test_shooting_on_level_2_matches():
+    kills = play_both(lambda game: game.advance_to_next_level(), scripted_inputs(3, 1200))
+    assert kills >= 4  # The script shoots enemies and brings bridges down on them
+
+
+def test_turning_at_bridges_matches():
+    def block_patrols(game):
+        # A bridge across every enemy's path turns it around, until the bridge dissolves
+        # and falls on whoever is underneath
+        for enemy in list(game.enemies):
+            add_bridge(game, enemy.x + 80, enemy.y + 10)
+
+    play_both(block_patrols, [Input.NONE] * 400)
+
+
+def test_chain_reaction_matches():
+    def collapse(game):
+        # Three rows of overlapping bridges over the level: once the first falls, they all come
+        # down and crush the enemies under them
+        bridges = [add_bridge(game, 40 + column * 70, y) for y in (80, 210, 340) for column in range(11)]
+        bridges[0].dissolve()
+
+    assert play_both(collapse, [Input.NONE] * 400) == 6  # Every enemy on level 1
@@ -0,0 +1,63 @@
+"""Check that two-player games keep score per player, put caught players out and pick a winner"""
+
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rainbow_islands_game import Game, GameState, Input
+
+
+def place_enemy(game, enemy, x, y):
+    """Move an enemy to x, y and keep it patrolling around there"""
+    enemy.x = enemy.prev_x = x
+    enemy.y = enemy.prev_y = y
+    enemy.patrol_start, enemy.patrol_end = x - 60, x + 90
+    game.enemy_grid.move(enemy, (enemy.x, enemy.y, enemy.width, enemy.height))
+
+
+def test_kills_score_for_the_shooter_and_caught_players_are_out():
+    game = Game(headless=True, seed=1, players=2, rewind_seconds=0)
+    # Right in the path of the second player's first shot
+    place_enemy(game, game.enemies[0], 210.0, 510.0)
+    game.step((Input.NONE, Input.SHOOT))
+    for _ in range(20):
+        game.step(Input.NONE)
+    assert game.scores == [0, 100]
+    assert game.winner() == 1
+
+    # The second player walks off the starting ledge; the first plays on alone
+    for _ in range(10):
+        game.step((Input.NONE, Input.RIGHT))
+    for _ in range(30):
+        game.step(Input.NONE)
+    assert game.caught == [False, True]
+    assert game.state == GameState.PLAYING
+
+    # Once the first player is caught as well, the game is over and the second player has won
+    player = game.players[0]
+    place_enemy(game, game.enemies[0], player.x, player.y)
+    game.step(Input.NONE)
+    assert game.caught == [True, True]
+    assert game.state == GameState.GAME_OVER
+    assert game.winner() == 1
+
+
+def test_snapshots_and_checksums_cover_scores_and_who_is_out():
+    game = Game(headless=True, seed=1, players=2, rewind_seconds=0)
+    place_enemy(game, game.enemies[0], 210.0, 510.0)
+    game.step((Input.NONE, Input.SHOOT))
+    for _ in range(10):
+        game.step((Input.NONE, Input.RIGHT))
+    for _ in range(30):
+        game.step(Input.NONE)
+    assert game.scores == [0, 100] and game.caught == [False, True]
+
+    other = Game(headless=True, seed=1, players=2, rewind_seconds=0)
+    other.restore(game.snapshot())
+    assert other.scores == [0, 100] and other.caught == [False, True]
+    assert other.checksum() == game.checksum()
+
+    other.scores[0] += 20
+    assert other.checksum() != game.checksum()
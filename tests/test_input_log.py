@@ -0,0 +1,79 @@
+"""Check that recorded sessions save, load and replay to the same checksums, and catch changes"""
+
+import os
+import random
+import struct
+import sys
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rainbow_islands_game import Game, Input, InputLog, np, verify_replay
+
+
+def record_session(path, frames=600):
+    """Play scripted inputs headless while recording them, and save the log to path"""
+    game = Game(headless=True, seed=11, record_path=path)
+    rng = random.Random(16)  # A script that kills an enemy, picks up its fruit, gets caught and restarts
+    for frame in range(frames):
+        flags = rng.choice((Input.NONE, Input.LEFT, Input.RIGHT, Input.RIGHT))
+        if rng.random() < 0.08:
+            flags |= Input.JUMP
+        if rng.random() < 0.2:
+            flags |= Input.SHOOT
+        if frame % 200 == 199:
+            flags |= Input.RESTART  # Only does something after a game over
+        game.step(flags)
+    game.recording.save(path)
+    return game
+
+
+def test_saved_log_loads_and_replays(tmp_path):
+    path = tmp_path / "session.rirp"
+    game = record_session(path)
+
+    log = InputLog.load(path)
+    assert log.seed == 11
+    assert len(log) == 600
+    assert log.inputs == game.recording.inputs
+    assert list(log.checksums) == list(game.recording.checksums)
+    assert verify_replay(log) is None
+
+
+@pytest.mark.skipif(np is None, reason="needs NumPy")
+def test_log_replays_with_array_enemies(tmp_path):
+    path = tmp_path / "session.rirp"
+    record_session(path)
+    assert verify_replay(InputLog.load(path), array_enemies=True) is None
+
+
+def test_changed_input_is_reported_at_its_frame(tmp_path):
+    path = tmp_path / "session.rirp"
+    record_session(path)
+
+    # Flip one frame's move to the other direction, straight in the file
+    frame = 50
+    data = bytearray(path.read_bytes())
+    offset = struct.calcsize(InputLog.HEADER) + frame
+    data[offset] = Input.RIGHT if data[offset] & Input.LEFT else Input.LEFT
+    path.write_bytes(data)
+
+    assert verify_replay(InputLog.load(path)) == frame
+
+
+def test_truncated_log_is_rejected(tmp_path):
+    path = tmp_path / "session.rirp"
+    record_session(path)
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError):
+        InputLog.load(path)
+
+
+@pytest.mark.parametrize("seed", [-1, 2 ** 32])
+def test_seed_that_does_not_fit_the_log_is_rejected_at_startup(tmp_path, seed):
+    with pytest.raises(ValueError):
+        Game(headless=True, seed=seed, record_path=tmp_path / "session.rirp")
+    # Without recording, any seed will do
+    Game(headless=True, seed=seed)
@@ -0,0 +1,38 @@
+"""Check exactly how early a jump can be pressed before landing and still happen"""
+
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rainbow_islands_game import JUMP_BUFFER_FRAMES, Input, Platform, Player, SpatialHash
+
+
+def drop(press_frame=None, frames=60):
+    """Drop a player onto a platform with jump pressed on one frame
+    
+    Returns whether the player started each frame on the ground, and the frame it jumped on (or None).
+    """
+    platforms = SpatialHash()
+    platform = Platform(100, 400, 200, 32)
+    platforms.insert(platform, (platform.x, platform.y, platform.width, platform.height))
+    player = Player(150, 200)
+    grounded = []
+    for frame in range(frames):
+        grounded.append(player.on_ground)
+        player.update(platforms, SpatialHash(), Input.JUMP if frame == press_frame else Input.NONE, 2000)
+        if player.vel_y < 0:
+            return grounded, frame
+    return grounded, None
+
+
+def test_jump_pressed_up_to_the_buffer_before_landing_happens_on_landing():
+    grounded, _ = drop()
+    landing = grounded.index(True)  # The first frame that starts on the platform
+    for frames_early in range(JUMP_BUFFER_FRAMES + 4):
+        _, jumped = drop(landing - frames_early)
+        if frames_early <= JUMP_BUFFER_FRAMES:
+            assert jumped == landing, f"a jump pressed {frames_early} frames early was lost"
+        else:
+            assert jumped is None, f"a jump pressed {frames_early} frames early still happened"
@@ -0,0 +1,95 @@
+"""Check that restoring a snapshot, or rewinding, puts the game back exactly as it was"""
+
+import os
+import random
+import sys
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rainbow_islands_game import Game, GameState, Input, np
+
+# Both ways of keeping enemies, the arrays only where NumPy is installed
+ENEMY_STORAGE = [False, pytest.param(True, marks=pytest.mark.skipif(np is None, reason="needs NumPy"))]
+
+
+def scripted_inputs(seed, frames):
+    """Random walking, jumping and shooting, so there are rainbows, dying enemies and fruit to restore"""
+    rng = random.Random(seed)
+    inputs = []
+    for _ in range(frames):
+        flags = rng.choice((Input.NONE, Input.LEFT, Input.RIGHT, Input.RIGHT))
+        if rng.random() < 0.08:
+            flags |= Input.JUMP
+        if rng.random() < 0.2:
+            flags |= Input.SHOOT
+        inputs.append(flags)
+    return inputs
+
+
+# Two scripts that keep the player alive for all 500 frames; the snapshots are taken
+# just after a kill, with the enemy still spinning away
+INPUTS = scripted_inputs(1, 200) + scripted_inputs(5, 300)
+SNAPSHOT_FRAME = 315
+
+
+def play(game, inputs):
+    """Step through inputs, returning the checksum after each frame"""
+    checksums = []
+    for flags in inputs:
+        game.step(flags)
+        checksums.append(game.checksum())
+    return checksums
+
+
+@pytest.mark.parametrize("array_enemies", ENEMY_STORAGE)
+def test_restore_replays_the_same_frames(array_enemies):
+    game = Game(headless=True, seed=5, array_enemies=array_enemies, rewind_seconds=0)
+    play(game, INPUTS[:SNAPSHOT_FRAME])
+    assert game.rainbows and game.dead_enemies
+    snapshot = game.snapshot()
+    before = game.checksum()
+
+    expected = play(game, INPUTS[SNAPSHOT_FRAME:])
+    game.restore(snapshot)
+    assert game.checksum() == before
+    assert play(game, INPUTS[SNAPSHOT_FRAME:]) == expected
+
+
+@pytest.mark.parametrize("array_enemies", ENEMY_STORAGE)
+def test_restore_across_a_level_change(array_enemies):
+    game = Game(headless=True, seed=5, array_enemies=array_enemies, rewind_seconds=0)
+    play(game, INPUTS[:SNAPSHOT_FRAME])
+    snapshot = game.snapshot()
+    expected = play(game, INPUTS[SNAPSHOT_FRAME:])
+
+    # Clear level 1, move on to level 2 and play a little of it
+    game.remove_enemies({enemy: True for enemy in game.enemies})
+    game.clear_entities()
+    game.step(Input.NONE)
+    assert game.state == GameState.LEVEL_COMPLETE
+    game.step(Input.NEXT_LEVEL)
+    assert game.level == 2 and game.state == GameState.PLAYING
+    play(game, INPUTS[:100])
+
+    # Back on level 1, with its enemies and the rest as they were
+    game.restore(snapshot)
+    assert game.level == 1
+    assert play(game, INPUTS[SNAPSHOT_FRAME:]) == expected
+
+
+def test_rewind_returns_to_earlier_frames():
+    game = Game(headless=True, seed=5)
+    checksums = [game.checksum()] + play(game, INPUTS[:300])
+    for frames_back in range(1, 121):
+        game.step(Input.REWIND)
+        assert game.checksum() == checksums[-1 - frames_back]
+
+    # Playing on from a rewound frame overwrites what came after it
+    expected = play(game, INPUTS[300:400])
+    for _ in range(100):
+        game.step(Input.REWIND)
+    assert game.checksum() == checksums[-121]
+    assert play(game, INPUTS[300:400]) == expected